@@ -7,10 +7,18 @@ Script para corrigir imports nos arquivos de teste organizados.
 Ajusta os caminhos relativos para apontar corretamente para o módulo src.
 """
 
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterator, List
+
+# Substrings que precisam estar presentes para que alguma correção se aplique
+TOKENS_CANDIDATOS = ('sys.path.insert', 'from src.utils', 'import src.utils')
+
+# Primeira linha iniciada por 'import ' (ponto de inserção do import do Path)
+PADRAO_PRIMEIRO_IMPORT = re.compile(r'^import ', re.MULTILINE)
 
 def corrigir_imports_arquivo(arquivo: Path) -> bool:
     """Corrige imports em um arquivo específico"""
@@ -18,6 +26,10 @@ def corrigir_imports_arquivo(arquivo: Path) -> bool:
         with open(arquivo, 'r', encoding='utf-8') as f:
             conteudo = f.read()
         
+        # Pré-filtro barato: sem nenhum token alvo, nenhuma regex pode casar
+        if not any(token in conteudo for token in TOKENS_CANDIDATOS):
+            return False
+        
         conteudo_original = conteudo
         
         # Padrões de import para corrigir
@@ -43,20 +55,14 @@ def corrigir_imports_arquivo(arquivo: Path) -> bool:
         # Verificar se precisa adicionar import do Path
         if 'Path(__file__).parent.parent.parent' in conteudo and 'from pathlib import Path' not in conteudo:
             # Adicionar import do Path se não existir
-            linhas = conteudo.split('\n')
-            import_adicionado = False
+            # Localiza a primeira linha 'import ' sem dividir o arquivo em linhas
+            match = PADRAO_PRIMEIRO_IMPORT.search(conteudo)
             
-            for i, linha in enumerate(linhas):
-                if linha.startswith('import ') and not import_adicionado:
-                    linhas.insert(i, 'from pathlib import Path')
-                    import_adicionado = True
-                    break
-            
-            if not import_adicionado:
+            if match:
+                conteudo = conteudo[:match.start()] + 'from pathlib import Path\n' + conteudo[match.start():]
+            else:
                 # Adicionar no início se não encontrou lugar melhor
-                linhas.insert(0, 'from pathlib import Path')
-            
-            conteudo = '\n'.join(linhas)
+                conteudo = 'from pathlib import Path\n' + conteudo
         
         # Salvar apenas se houver mudanças
         if conteudo != conteudo_original:
@@ -70,6 +76,13 @@ def corrigir_imports_arquivo(arquivo: Path) -> bool:
         print(f"❌ Erro ao processar {arquivo}: {e}")
         return False
 
+def iterar_arquivos_teste(raiz: Path) -> Iterator[Path]:
+    """Percorre a árvore produzindo os arquivos .py de teste (ignora READMEs convertidos)"""
+    for diretorio, _, arquivos in os.walk(raiz):
+        for nome in arquivos:
+            if nome.endswith('.py') and not nome.startswith('README'):
+                yield Path(diretorio) / nome
+
 def main():
     """Função principal"""
     print("🔧 CORREÇÃO DE IMPORTS - TESTES ORGANIZADOS")
@@ -83,31 +96,38 @@ def main():
         print("   Execute primeiro: python organizador_testes.py")
         sys.exit(1)
     
-    # Encontrar todos os arquivos .py
-    arquivos_python = list(pasta_testes.rglob("*.py"))
-    
-    # Filtrar apenas arquivos de teste (não READMEs convertidos)
-    arquivos_teste = [arq for arq in arquivos_python if not arq.name.startswith('README')]
-    
-    print(f"📋 Encontrados {len(arquivos_teste)} arquivos para corrigir")
+    print(f"📋 Corrigindo arquivos em {pasta_testes}")
     
+    total = 0
     corrigidos = 0
     erros = 0
     
-    for arquivo in arquivos_teste:
-        try:
-            if corrigir_imports_arquivo(arquivo):
-                print(f"   ✅ {arquivo.relative_to(pasta_testes)}")
-                corrigidos += 1
-            else:
-                print(f"   ⏭️  {arquivo.relative_to(pasta_testes)} (sem alterações)")
-        except Exception as e:
-            print(f"   ❌ {arquivo.relative_to(pasta_testes)}: {e}")
-            erros += 1
+    # Cada arquivo é independente: distribui entre processos para usar todos os núcleos.
+    # Os caminhos são produzidos sob demanda pelo gerador, sem montar listas intermediárias.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futuros = {
+            executor.submit(corrigir_imports_arquivo, arquivo): arquivo
+            for arquivo in iterar_arquivos_teste(pasta_testes)
+        }
+        
+        # Falha em um arquivo (inclusive do próprio pool) não interrompe os demais
+        for futuro in as_completed(futuros):
+            arquivo = futuros[futuro]
+            total += 1
+            try:
+                if futuro.result():
+                    print(f"   ✅ {arquivo.relative_to(pasta_testes)}")
+                    corrigidos += 1
+                else:
+                    print(f"   ⏭️  {arquivo.relative_to(pasta_testes)} (sem alterações)")
+            except Exception as e:
+                print(f"   ❌ {arquivo.relative_to(pasta_testes)}: {e}")
+                erros += 1
     
+    print(f"\n📋 Arquivos analisados: {total}")
     print(f"\n📊 RESULTADO:")
     print(f"   ✅ Arquivos corrigidos: {corrigidos}")
-    print(f"   ⏭️  Sem alterações: {len(arquivos_teste) - corrigidos - erros}")
+    print(f"   ⏭️  Sem alterações: {total - corrigidos - erros}")
     print(f"   ❌ Erros: {erros}")
     
     if erros == 0:
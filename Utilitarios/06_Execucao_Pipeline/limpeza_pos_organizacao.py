@@ -12,9 +12,20 @@ Certifique-se de que o backup foi criado corretamente antes de executar.
 
 import argparse
 import logging
+import os
 import sys
 from pathlib import Path
-from typing import List
+from typing import List, Set
+
+# Prefixos dos arquivos de teste soltos na raiz
+PREFIXOS_TESTE = ("teste_", "test_")
+
+# Arquivos importantes que nunca devem ser removidos
+ARQUIVOS_MANTER = frozenset({
+    "teste_config.py",  # Arquivo vazio, pode ser útil
+    "organizador_testes.py",  # Script de organização
+    "limpeza_pos_organizacao.py"  # Este script
+})
 
 def configurar_logging(verbose: bool = False) -> logging.Logger:
     """Configura sistema de logging"""
@@ -25,7 +36,7 @@ def configurar_logging(verbose: bool = False) -> logging.Logger:
         format='%(asctime)s - %(levelname)s - %(message)s',
         handlers=[
             logging.StreamHandler(),
-            logging.FileHandler('limpeza_pos_organizacao.log', encoding='utf-8')
+            logging.FileHandler('limpeza_pos_organizacao.log', encoding='utf-8', delay=True)
         ],
         force=True
     )
@@ -34,50 +45,19 @@ def configurar_logging(verbose: bool = False) -> logging.Logger:
 
 def obter_arquivos_para_remover(diretorio_raiz: Path) -> List[Path]:
     """Identifica arquivos de teste que podem ser removidos"""
-    arquivos_remover = []
-    
-    # Padrões de arquivos de teste na raiz que foram organizados
-    padroes_raiz = [
-        "teste_*.py",
-        "test_*.py"
-    ]
-    
-    # Arquivos específicos que sabemos que foram organizados
-    arquivos_especificos = [
-        "teste_main.py",
-        "teste_consistencia.py", 
-        "teste_final_performance.py",
-        "teste_gerar_xml_comparativo.py",
-        "teste_nome_xml_final.py",
-        "teste_normalizacao_chave.py",
-        "teste_pratico_comparacao.py",
-        "teste_script_verificador_xmls.py",
-        "teste_simples_xml.py"
-    ]
-    
-    # Buscar na raiz
-    for padrao in padroes_raiz:
-        arquivos_remover.extend(diretorio_raiz.glob(padrao))
-    
-    # Adicionar arquivos específicos
-    for arquivo in arquivos_especificos:
-        caminho = diretorio_raiz / arquivo
-        if caminho.exists():
-            arquivos_remover.append(caminho)
-    
-    # Excluir arquivos importantes que devem ser mantidos
-    arquivos_manter = {
-        "teste_config.py",  # Arquivo vazio, pode ser útil
-        "organizador_testes.py",  # Script de organização
-        "limpeza_pos_organizacao.py"  # Este script
-    }
-    
-    arquivos_filtrados = []
-    for arquivo in arquivos_remover:
-        if arquivo.name not in arquivos_manter:
-            arquivos_filtrados.append(arquivo)
-    
-    return list(set(arquivos_filtrados))  # Remove duplicatas
+    # Arquivos de teste na raiz que foram organizados (teste_*.py / test_*.py),
+    # coletados em uma única listagem do diretório, já excluindo os que devem ser mantidos
+    with os.scandir(diretorio_raiz) as entradas:
+        arquivos_remover: Set[Path] = {
+            Path(entrada.path)
+            for entrada in entradas
+            if entrada.name.startswith(PREFIXOS_TESTE)
+            and entrada.name.endswith('.py')
+            and entrada.name not in ARQUIVOS_MANTER
+            and entrada.is_file(follow_symlinks=False)
+        }
+    
+    return sorted(arquivos_remover)
 
 def main():
     """Função principal"""
@@ -150,9 +130,10 @@ Exemplos de uso:
             logger.info("✅ Nenhum arquivo para remover encontrado")
             sys.exit(0)
         
-        logger.info(f"🗑️  Encontrados {len(arquivos_remover)} arquivos para remover:")
-        for arquivo in sorted(arquivos_remover):
-            logger.info(f"   - {arquivo.name}")
+        logger.info("🗑️  Encontrados %d arquivos para remover:", len(arquivos_remover))
+        if logger.isEnabledFor(logging.INFO):
+            for arquivo in arquivos_remover:
+                logger.info("   - %s", arquivo.name)
         
         if args.dry_run:
             logger.info("🎭 MODO SIMULAÇÃO - Nenhum arquivo foi removido")
@@ -186,11 +167,11 @@ Exemplos de uso:
         
         for arquivo in arquivos_remover:
             try:
-                arquivo.unlink()
-                logger.info(f"   ✅ Removido: {arquivo.name}")
+                os.unlink(arquivo)
+                logger.info("   ✅ Removido: %s", arquivo.name)
                 removidos += 1
             except Exception as e:
-                logger.error(f"   ❌ Erro ao remover {arquivo.name}: {e}")
+                logger.error("   ❌ Erro ao remover %s: %s", arquivo.name, e)
                 erros += 1
         
         logger.info(f"🗑️  Limpeza concluída: {removidos} removidos, {erros} erros")
@@ -16,7 +16,76 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.omie_client_async import carregar_configuracoes_client
-from src.utils import conexao_otimizada
+from src.utils import conexao_otimizada, json_dumps, json_loads
+
+# Timeouts das requisições (criados uma vez, reutilizados em todas as chamadas)
+TIMEOUT_NF = aiohttp.ClientTimeout(total=30)
+TIMEOUT_LISTAGEM = aiohttp.ClientTimeout(total=60)
+
+# Cabeçalhos das requisições JSON (corpo serializado com src.utils.json_dumps)
+HEADERS_JSON = {"Content-Type": "application/json"}
+
+# Estatísticas gerais da tabela notas, calculadas em uma única varredura
+DESCRICOES_ESTATISTICAS = (
+    "Total de registros",
+    "Com XML baixado",
+    "Sem erro",
+    "Com chave NFe",
+    "Com ID NFe",
+    "Com status",
+    "Status NULL/vazio",
+)
+
+SQL_ESTATISTICAS = """
+    SELECT COUNT(*),
+           COALESCE(SUM(xml_baixado = 1), 0),
+           COALESCE(SUM(erro = 0), 0),
+           COALESCE(SUM(cChaveNFe IS NOT NULL AND cChaveNFe != ''), 0),
+           COALESCE(SUM(nIdNF IS NOT NULL), 0),
+           COALESCE(SUM(status IS NOT NULL AND status != ''), 0),
+           COALESCE(SUM(status IS NULL OR status = ''), 0)
+    FROM notas
+"""
+
+# Motivos de inelegibilidade, também calculados em uma única varredura
+DESCRICOES_DIAGNOSTICO_ELEGIBILIDADE = (
+    "Registros totais",
+    "XML não baixado",
+    "Com erro",
+    "Chave NFe nula",
+    "ID NFe nulo",
+    "Já tem status",
+)
+
+SQL_DIAGNOSTICO_ELEGIBILIDADE = """
+    SELECT COUNT(*),
+           COALESCE(SUM(xml_baixado != 1), 0),
+           COALESCE(SUM(erro != 0), 0),
+           COALESCE(SUM(cChaveNFe IS NULL OR cChaveNFe = ''), 0),
+           COALESCE(SUM(nIdNF IS NULL), 0),
+           COALESCE(SUM(status IS NOT NULL AND status != '' AND status != 'INDEFINIDO'), 0)
+    FROM notas
+"""
+
+# Índice parcial de cobertura para a amostragem de registros elegíveis
+# (WHERE xml_baixado = 1 AND erro = 0 ... ORDER BY dEmi DESC LIMIT 5).
+# xml_baixado e erro ficam fora da chave: o WHERE do índice já os fixa.
+# Criado só por este diagnóstico, não pelo pipeline.
+SQL_INDICE_ELEGIBILIDADE = """
+    CREATE INDEX IF NOT EXISTS idx_notas_elegibilidade
+    ON notas(dEmi DESC, cChaveNFe, nIdNF)
+    WHERE xml_baixado = 1 AND erro = 0
+"""
+
+
+def garantir_indice_elegibilidade():
+    """Cria (uma única vez) o índice usado pelas consultas de elegibilidade."""
+    try:
+        with conexao_otimizada("omie.db") as conn:
+            conn.execute(SQL_INDICE_ELEGIBILIDADE)
+            conn.commit()
+    except Exception as e:
+        print(f"⚠️ Não foi possível criar índice de elegibilidade: {e}")
 
 
 def configurar_logging_debug():
@@ -31,7 +100,7 @@ def configurar_logging_debug():
     )
 
 
-async def testar_api_individual():
+async def testar_api_individual(session: aiohttp.ClientSession):
     """Testa consulta individual de uma NFe específica."""
     
     print("🔍 TESTE 1: CONSULTA INDIVIDUAL DE NFE")
@@ -52,7 +121,7 @@ async def testar_api_individual():
                 LIMIT 5
             """)
             
-            registros = cursor.fetchall()
+            registros = cursor.fetchmany(5)
             
         if not registros:
             print("❌ Nenhum registro encontrado para teste")
@@ -63,38 +132,41 @@ async def testar_api_individual():
         
         print(f"📋 Testando com {len(registros)} registros:")
         
-        async with aiohttp.ClientSession() as session:
-            for i, (chave_nfe, nid_nf) in enumerate(registros, 1):
-                print(f"\n🔸 Teste {i}/5:")
-                print(f"   Chave: {chave_nfe}")
-                print(f"   ID: {nid_nf}")
-                
-                # Testa consulta por ID (preferencial)
-                payload_id = {
-                    "app_key": config["app_key"],
-                    "app_secret": config["app_secret"],
-                    "call": "ObterNfe",
-                    "param": [{"nIdNF": nid_nf}]
-                }
-                
+        # Limita chamadas simultâneas à API no lugar da pausa fixa entre testes
+        semaforo = asyncio.Semaphore(3)
+        
+        async def _probe(i, chave_nfe, nid_nf):
+            # Acumula a saída para imprimir o bloco de cada NFe sem intercalar
+            saida = [f"\n🔸 Teste {i}/5:", f"   Chave: {chave_nfe}", f"   ID: {nid_nf}"]
+            
+            # Testa consulta por ID (preferencial)
+            payload_id = {
+                "app_key": config["app_key"],
+                "app_secret": config["app_secret"],
+                "call": "ObterNfe",
+                "param": [{"nIdNF": nid_nf}]
+            }
+            
+            async with semaforo:
                 try:
-                    print(f"   📡 Consultando por ID...")
+                    saida.append(f"   📡 Consultando por ID...")
                     async with session.post(
                         config["base_url_nf"],
-                        json=payload_id,
-                        timeout=aiohttp.ClientTimeout(total=30)
+                        data=json_dumps(payload_id),
+                        headers=HEADERS_JSON,
+                        timeout=TIMEOUT_NF
                     ) as response:
-                        print(f"   Status HTTP: {response.status}")
+                        saida.append(f"   Status HTTP: {response.status}")
                         
                         if response.status == 200:
-                            data = await response.json()
+                            data = json_loads(await response.read())
                             
                             if "faultstring" in data:
-                                print(f"   ❌ Erro API: {data['faultstring']}")
-                                print(f"   Código: {data.get('faultcode', 'N/A')}")
+                                saida.append(f"   ❌ Erro API: {data['faultstring']}")
+                                saida.append(f"   Código: {data.get('faultcode', 'N/A')}")
                                 
                                 # Tenta por chave se falhou por ID
-                                print(f"   📡 Tentando por chave...")
+                                saida.append(f"   📡 Tentando por chave...")
                                 payload_chave = {
                                     "app_key": config["app_key"],
                                     "app_secret": config["app_secret"],
@@ -104,38 +176,43 @@ async def testar_api_individual():
                                 
                                 async with session.post(
                                     config["base_url_nf"],
-                                    json=payload_chave,
-                                    timeout=aiohttp.ClientTimeout(total=30)
+                                    data=json_dumps(payload_chave),
+                                    headers=HEADERS_JSON,
+                                    timeout=TIMEOUT_NF
                                 ) as response2:
                                     if response2.status == 200:
-                                        data2 = await response2.json()
+                                        data2 = json_loads(await response2.read())
                                         if "faultstring" in data2:
-                                            print(f"   ❌ Erro por chave: {data2['faultstring']}")
+                                            saida.append(f"   ❌ Erro por chave: {data2['faultstring']}")
                                         else:
-                                            print(f"   ✅ Sucesso por chave!")
-                                            print(f"   Campos retornados: {list(data2.keys())}")
+                                            saida.append(f"   ✅ Sucesso por chave!")
+                                            saida.append(f"   Campos retornados: {list(data2.keys())}")
                                             
                                             # Mostra dados relevantes
                                             for campo in ["situacao", "cSitNFe", "xMotivo", "tpNF", "tpAmb"]:
                                                 if campo in data2:
-                                                    print(f"   {campo}: {data2[campo]}")
+                                                    saida.append(f"   {campo}: {data2[campo]}")
                                     
                             else:
-                                print(f"   ✅ Sucesso por ID!")
-                                print(f"   Campos retornados: {list(data.keys())}")
+                                saida.append(f"   ✅ Sucesso por ID!")
+                                saida.append(f"   Campos retornados: {list(data.keys())}")
                                 
                                 # Mostra dados relevantes
                                 for campo in ["situacao", "cSitNFe", "xMotivo", "tpNF", "tpAmb"]:
                                     if campo in data:
-                                        print(f"   {campo}: {data[campo]}")
+                                        saida.append(f"   {campo}: {data[campo]}")
                         else:
-                            print(f"   ❌ Status HTTP inválido: {response.status}")
+                            saida.append(f"   ❌ Status HTTP inválido: {response.status}")
                             
                 except Exception as e:
-                    print(f"   ❌ Erro na requisição: {e}")
-                
-                # Pausa entre testes
-                await asyncio.sleep(2)
+                    saida.append(f"   ❌ Erro na requisição: {e}")
+            
+            print("\n".join(saida))
+        
+        await asyncio.gather(*[
+            _probe(i, chave_nfe, nid_nf)
+            for i, (chave_nfe, nid_nf) in enumerate(registros, 1)
+        ])
         
         return True
         
@@ -144,7 +221,7 @@ async def testar_api_individual():
         return False
 
 
-async def testar_api_listagem():
+async def testar_api_listagem(session: aiohttp.ClientSession):
     """Testa o endpoint de listagem de NFe."""
     
     print("\n🔍 TESTE 2: LISTAGEM DE NFES EMITIDAS")
@@ -172,54 +249,54 @@ async def testar_api_listagem():
         for k, v in filtros.items():
             print(f"   {k}: {v}")
         
-        async with aiohttp.ClientSession() as session:
-            print(f"\n📡 Enviando requisição...")
+        print(f"\n📡 Enviando requisição...")
+        
+        async with session.post(
+            "https://app.omie.com.br/api/v1/nfe/",
+            data=json_dumps(payload),
+            headers=HEADERS_JSON,
+            timeout=TIMEOUT_LISTAGEM
+        ) as response:
+            print(f"Status HTTP: {response.status}")
             
-            async with session.post(
-                "https://app.omie.com.br/api/v1/nfe/",
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=60)
-            ) as response:
-                print(f"Status HTTP: {response.status}")
+            if response.status == 200:
+                data = json_loads(await response.read())
                 
-                if response.status == 200:
-                    data = await response.json()
+                if "faultstring" in data:
+                    print(f"❌ Erro API: {data['faultstring']}")
+                    print(f"Código: {data.get('faultcode', 'N/A')}")
+                    return False
+                else:
+                    print(f"✅ Sucesso na listagem!")
+                    print(f"Campos principais: {list(data.keys())}")
                     
-                    if "faultstring" in data:
-                        print(f"❌ Erro API: {data['faultstring']}")
-                        print(f"Código: {data.get('faultcode', 'N/A')}")
-                        return False
-                    else:
-                        print(f"✅ Sucesso na listagem!")
-                        print(f"Campos principais: {list(data.keys())}")
+                    if "total_de_registros" in data:
+                        print(f"Total de registros: {data['total_de_registros']:,}")
+                    
+                    if "nfes_emitidas" in data and data["nfes_emitidas"]:
+                        print(f"NFes retornadas: {len(data['nfes_emitidas'])}")
                         
-                        if "total_de_registros" in data:
-                            print(f"Total de registros: {data['total_de_registros']:,}")
+                        # Analisa primeira NFe
+                        primeira_nfe = data["nfes_emitidas"][0]
+                        print(f"\n📄 Primeira NFe:")
+                        print(f"   Campos: {list(primeira_nfe.keys())}")
                         
-                        if "nfes_emitidas" in data and data["nfes_emitidas"]:
-                            print(f"NFes retornadas: {len(data['nfes_emitidas'])}")
-                            
-                            # Analisa primeira NFe
-                            primeira_nfe = data["nfes_emitidas"][0]
-                            print(f"\n📄 Primeira NFe:")
-                            print(f"   Campos: {list(primeira_nfe.keys())}")
-                            
-                            for campo in ["cChaveNFe", "nIdNF", "situacao", "cSitNFe", "xMotivo"]:
-                                if campo in primeira_nfe:
-                                    valor = primeira_nfe[campo]
-                                    if isinstance(valor, str) and len(valor) > 50:
-                                        valor = valor[:50] + "..."
-                                    print(f"   {campo}: {valor}")
-                        else:
-                            print("⚠️ Nenhuma NFe retornada no período")
-                            
-                        return True
-                else:
-                    print(f"❌ Status HTTP inválido: {response.status}")
-                    text = await response.text()
-                    print(f"Resposta: {text[:500]}...")
-                    return False
-        
+                        for campo in ["cChaveNFe", "nIdNF", "situacao", "cSitNFe", "xMotivo"]:
+                            if campo in primeira_nfe:
+                                valor = primeira_nfe[campo]
+                                if isinstance(valor, str) and len(valor) > 50:
+                                    valor = valor[:50] + "..."
+                                print(f"   {campo}: {valor}")
+                    else:
+                        print("⚠️ Nenhuma NFe retornada no período")
+                        
+                    return True
+            else:
+                print(f"❌ Status HTTP inválido: {response.status}")
+                text = await response.text()
+                print(f"Resposta: {text[:500]}...")
+                return False
+    
     except Exception as e:
         print(f"❌ Erro no teste de listagem: {e}")
         return False
@@ -246,19 +323,11 @@ def verificar_estrutura_banco():
             # Estatísticas gerais
             print(f"\n📊 Estatísticas:")
             
-            queries_stats = [
-                ("Total de registros", "SELECT COUNT(*) FROM notas"),
-                ("Com XML baixado", "SELECT COUNT(*) FROM notas WHERE xml_baixado = 1"),
-                ("Sem erro", "SELECT COUNT(*) FROM notas WHERE erro = 0"),
-                ("Com chave NFe", "SELECT COUNT(*) FROM notas WHERE cChaveNFe IS NOT NULL AND cChaveNFe != ''"),
-                ("Com ID NFe", "SELECT COUNT(*) FROM notas WHERE nIdNF IS NOT NULL"),
-                ("Com status", "SELECT COUNT(*) FROM notas WHERE status IS NOT NULL AND status != ''"),
-                ("Status NULL/vazio", "SELECT COUNT(*) FROM notas WHERE status IS NULL OR status = ''"),
-            ]
+            # Uma única varredura com agregação condicional em vez de uma query por métrica
+            cursor.execute(SQL_ESTATISTICAS)
+            valores = cursor.fetchone()
             
-            for descricao, query in queries_stats:
-                cursor.execute(query)
-                resultado = cursor.fetchone()[0]
+            for descricao, resultado in zip(DESCRICOES_ESTATISTICAS, valores):
                 print(f"   {descricao:<20}: {resultado:,}")
             
             # Amostra de registros elegíveis
@@ -275,7 +344,7 @@ def verificar_estrutura_banco():
                 LIMIT 5
             """)
             
-            registros = cursor.fetchall()
+            registros = cursor.fetchmany(5)
             for i, reg in enumerate(registros, 1):
                 chave = reg[0][:20] + "..." if reg[0] else "NULL"
                 print(f"   {i}. Chave: {chave} | ID: {reg[1]} | Status: {reg[2]} | Data: {reg[3]} | Num: {reg[4]}")
@@ -286,18 +355,10 @@ def verificar_estrutura_banco():
                 # Verifica por que não há registros elegíveis
                 print(f"\n🔍 Diagnóstico de elegibilidade:")
                 
-                checks = [
-                    ("Registros totais", "SELECT COUNT(*) FROM notas"),
-                    ("XML não baixado", "SELECT COUNT(*) FROM notas WHERE xml_baixado != 1"),
-                    ("Com erro", "SELECT COUNT(*) FROM notas WHERE erro != 0"),
-                    ("Chave NFe nula", "SELECT COUNT(*) FROM notas WHERE cChaveNFe IS NULL OR cChaveNFe = ''"),
-                    ("ID NFe nulo", "SELECT COUNT(*) FROM notas WHERE nIdNF IS NULL"),
-                    ("Já tem status", "SELECT COUNT(*) FROM notas WHERE status IS NOT NULL AND status != '' AND status != 'INDEFINIDO'"),
-                ]
+                cursor.execute(SQL_DIAGNOSTICO_ELEGIBILIDADE)
+                contagens = cursor.fetchone()
                 
-                for desc, query in checks:
-                    cursor.execute(query)
-                    count = cursor.fetchone()[0]
+                for desc, count in zip(DESCRICOES_DIAGNOSTICO_ELEGIBILIDADE, contagens):
                     print(f"   {desc}: {count:,}")
         
         return True
@@ -319,6 +380,9 @@ async def main():
     from datetime import datetime
     configurar_logging_debug()
     
+    # Garante índice para as consultas de amostragem dos testes
+    garantir_indice_elegibilidade()
+    
     resultados = []
     
     # Teste 1: Estrutura do banco
@@ -326,13 +390,16 @@ async def main():
     resultado1 = verificar_estrutura_banco()
     resultados.append(("Estrutura do Banco", resultado1))
     
-    # Teste 2: API Individual 
-    resultado2 = await testar_api_individual()
-    resultados.append(("API Individual", resultado2))
-    
-    # Teste 3: API Listagem
-    resultado3 = await testar_api_listagem()
-    resultados.append(("API Listagem", resultado3))
+    # Sessão HTTP única compartilhada pelos testes de API (reaproveita conexões/TLS)
+    connector = aiohttp.TCPConnector(limit=16, ttl_dns_cache=300, keepalive_timeout=60)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # Teste 2: API Individual 
+        resultado2 = await testar_api_individual(session)
+        resultados.append(("API Individual", resultado2))
+        
+        # Teste 3: API Listagem
+        resultado3 = await testar_api_listagem(session)
+        resultados.append(("API Listagem", resultado3))
     
     # Relatório final
     print("\n" + "=" * 70)
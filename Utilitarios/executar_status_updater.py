@@ -6,8 +6,15 @@ Executa atualização de status das notas fiscais usando a API Omie.
 import sys
 import asyncio
 import logging
+from datetime import datetime
 from pathlib import Path
 
+try:
+    import uvloop
+    UVLOOP_DISPONIVEL = True
+except ImportError:
+    UVLOOP_DISPONIVEL = False
+
 # Adiciona o diretório raiz ao path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
@@ -21,18 +28,18 @@ async def main():
     log_dir = Path("log")
     log_dir.mkdir(exist_ok=True)
     
-    from datetime import datetime
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    log_file = log_dir / f"status_updater_{timestamp}.log"
+    log_file = log_dir / f"status_updater_{datetime.now():%Y%m%d_%H%M%S}.log"
     
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    # Configura handlers apenas uma vez por processo (evita vazar FileHandlers em reexecuções)
+    if not logging.getLogger().handlers:
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            handlers=[
+                logging.FileHandler(log_file, encoding='utf-8'),
+                logging.StreamHandler(sys.stdout)
+            ]
+        )
     
     logger = logging.getLogger(__name__)
     
@@ -146,4 +153,8 @@ if __name__ == "__main__":
         show_help()
         sys.exit(0)
     
-    asyncio.run(main())
+    # uvloop (quando instalado) reduz o overhead do event loop
+    if UVLOOP_DISPONIVEL:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
@@ -4,24 +4,121 @@ EXEMPLO DE USO DO CÓDIGO DE VERIFICAÇÃO DE STATUS
 Demonstra como usar os endpoints para verificar status das NFe.
 """
 
+import io
 import sys
+import logging
+from collections import Counter, deque
+from contextvars import ContextVar
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Awaitable, Callable, Iterable, Iterator, Optional, TextIO, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import asyncio
 import aiohttp
 import sqlite3
 
+try:
+    import pandas as pd
+    PANDAS_DISPONIVEL = True
+except ImportError:
+    PANDAS_DISPONIVEL = False
+
+try:
+    import aiometer
+    AIOMETER_DISPONIVEL = True
+except ImportError:
+    AIOMETER_DISPONIVEL = False
+
+try:
+    import uvloop
+    UVLOOP_DISPONIVEL = True
+except ImportError:
+    UVLOOP_DISPONIVEL = False
+
 # Adiciona o diretório raiz ao path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.omie_client_async import carregar_configuracoes_client
+from src.utils import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+
+# Cabeçalhos das requisições JSON (corpo serializado com src.utils.json_dumps)
+HEADERS_JSON = {"Content-Type": "application/json", "Accept-Encoding": "gzip, deflate"}
+
+# Tamanho dos blocos lidos da resposta HTTP (64 KiB)
+TAMANHO_BLOCO_RESPOSTA = 1 << 16
+
+# Limite de páginas consultadas simultaneamente (rate limit da API Omie)
+MAX_PAGINAS_SIMULTANEAS = 5
+
+# Ritmo máximo de novas consultas por segundo (um abaixo do limite da API, folga para retentativas)
+MAX_PAGINAS_POR_SEGUNDO = 4
+
+# Tentativas por página quando a API responde HTTP 429 (Too Many Requests)
+MAX_TENTATIVAS_429 = 3
+
+# A partir deste tamanho de lote a classificação é feita de forma vetorizada (pandas, se instalado)
+LIMIAR_CLASSIFICACAO_VETORIZADA = 100_000
+
+# Situação retornada pela API (minúscula) -> status gravado no banco
+MAPA_STATUS = {
+    situacao: situacao.upper()
+    for situacao in ("cancelada", "autorizada", "rejeitada", "denegada", "inutilizada", "processando", "pendente")
+}
+
+# Configuração SQLite aplicada antes das atualizações de status em lote
+PRAGMAS_ESCRITA_LOTE = """
+    PRAGMA journal_mode = WAL;
+    PRAGMA synchronous = NORMAL;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA cache_size = -131072;
+"""
+
+# Texto único do UPDATE de status: sempre o mesmo statement preparado no cache do sqlite3
+SQL_UPDATE_STATUS = "UPDATE notas SET status = ? WHERE cChaveNFe = ?"
 
+# Linhas por transação no UPDATE de status e frequência do checkpoint do WAL
+TAMANHO_LOTE_UPDATE = 10_000
+LOTES_POR_CHECKPOINT = 10
 
-def verificar_status_nfe_sincronos(auth: Dict[str, str], filtros: Dict[str, Any]) -> Dict[str, Any]:
+# Sessão HTTP síncrona compartilhada: reaproveita conexões e repete em 429/5xx
+SESSAO_HTTP = requests.Session()
+SESSAO_HTTP.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=["POST"]
+    )
+))
+
+# Indica se o schema (coluna status) já foi verificado neste processo
+_SCHEMA_STATUS_VERIFICADO = False
+
+# Destino da saída dos exemplos. Cada exemplo executado em paralelo define o seu
+# buffer no próprio contexto (task/thread); None = sys.stdout
+_SAIDA_EXEMPLO: ContextVar[Optional[TextIO]] = ContextVar("_SAIDA_EXEMPLO", default=None)
+
+
+def exibir(*args, **kwargs) -> None:
+    """print() direcionado à saída do exemplo em execução."""
+    print(*args, file=_SAIDA_EXEMPLO.get(), **kwargs)
+
+
+def verificar_status_nfe_sincronos(
+    auth: Dict[str, str],
+    filtros: Dict[str, Any],
+    session: Optional[requests.Session] = None
+) -> Dict[str, Any]:
     """
     Consulta o endpoint de NF-e emitidas e retorna a lista de notas com seus status.
     Versão síncrona usando requests (baseada no seu código).
+    Sem session informada, usa a sessão do módulo (keep-alive e retentativas).
     """
     payload = {
         **auth,
@@ -29,9 +126,15 @@ def verificar_status_nfe_sincronos(auth: Dict[str, str], filtros: Dict[str, Any]
         "param": filtros
     }
     
-    resp = requests.post("https://app.omie.com.br/api/v1/nfe/", json=payload, timeout=10)
+    http = session if session is not None else SESSAO_HTTP
+    resp = http.post(
+        "https://app.omie.com.br/api/v1/nfe/",
+        data=json_dumps(payload),
+        headers=HEADERS_JSON,
+        timeout=10
+    )
     resp.raise_for_status()
-    return resp.json()
+    return json_loads(resp.content)
 
 
 def is_cancelada(nota: Dict[str, Any]) -> bool:
@@ -42,9 +145,14 @@ def is_cancelada(nota: Dict[str, Any]) -> bool:
     return nota.get("situacao", "").lower() == "cancelada"
 
 
-async def verificar_status_nfe_async(auth: Dict[str, str], filtros: Dict[str, Any]) -> Dict[str, Any]:
+async def verificar_status_nfe_async(
+    session: aiohttp.ClientSession,
+    auth: Dict[str, str],
+    filtros: Dict[str, Any]
+) -> Dict[str, Any]:
     """
     Versão assíncrona usando aiohttp para melhor integração com o pipeline.
+    Recebe a sessão do chamador para reaproveitar conexões entre chamadas.
     """
     payload = {
         **auth,
@@ -52,14 +160,54 @@ async def verificar_status_nfe_async(auth: Dict[str, str], filtros: Dict[str, An
         "param": filtros
     }
     
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            "https://app.omie.com.br/api/v1/nfe/", 
-            json=payload,
-            timeout=aiohttp.ClientTimeout(total=10)
-        ) as response:
-            response.raise_for_status()
-            return await response.json()
+    async with session.post(
+        "https://app.omie.com.br/api/v1/nfe/", 
+        data=json_dumps(payload),
+        headers=HEADERS_JSON,
+        timeout=aiohttp.ClientTimeout(total=10)
+    ) as response:
+        response.raise_for_status()
+        
+        # Acumula o corpo em blocos (páginas grandes) e decodifica de uma vez
+        corpo = bytearray()
+        async for bloco in response.content.iter_chunked(TAMANHO_BLOCO_RESPOSTA):
+            corpo.extend(bloco)
+        return json_loads(corpo)
+
+
+async def consultar_pagina_limitada(
+    session: aiohttp.ClientSession,
+    semaforo: asyncio.Semaphore,
+    auth: Dict[str, str],
+    filtros: Dict[str, Any],
+    pagina: int
+) -> Dict[str, Any]:
+    """
+    Consulta uma página respeitando o limite de requisições simultâneas.
+    Em caso de HTTP 429 aguarda com backoff exponencial e tenta novamente.
+    """
+    for tentativa in range(MAX_TENTATIVAS_429):
+        try:
+            async with semaforo:
+                return await verificar_status_nfe_async(session, auth, {**filtros, "pagina": pagina})
+        except aiohttp.ClientResponseError as e:
+            if e.status != 429 or tentativa == MAX_TENTATIVAS_429 - 1:
+                raise
+            await asyncio.sleep(2 ** tentativa)
+
+
+def classificar_notas_vetorizado(notas: list) -> Tuple[Counter, Iterator[Tuple[str, Optional[str]]]]:
+    """
+    Classifica as notas em lote com pandas (mesmas regras do loop em Python).
+    Retorna a contagem por status e os pares (status, chave_nfe) para o UPDATE.
+    """
+    df = pd.DataFrame(notas, columns=["chave_nfe", "situacao"])
+    
+    situacao = df["situacao"].fillna("").astype(str).str.lower()
+    status = situacao.map(MAPA_STATUS).fillna(situacao.str.upper()).replace("", "INDEFINIDO")
+    chaves = df["chave_nfe"].astype(object).where(df["chave_nfe"].notna(), None)
+    
+    return Counter(status.value_counts().to_dict()), zip(status, chaves)
 
 
 def processar_notas_com_status(notas: list, salvar_banco: bool = False) -> Dict[str, int]:
@@ -67,79 +215,114 @@ def processar_notas_com_status(notas: list, salvar_banco: bool = False) -> Dict[
     Processa lista de notas e contabiliza por status.
     Opcionalmente salva no banco de dados.
     """
-    estatisticas = {
-        "canceladas": 0,
-        "autorizadas": 0,
-        "outras": 0,
-        "total": len(notas)
-    }
-    
-    notas_para_salvar = []
-    
-    for nota in notas:
-        if is_cancelada(nota):
-            estatisticas["canceladas"] += 1
-            status = "CANCELADA"
-        elif nota.get("situacao", "").lower() == "autorizada":
-            estatisticas["autorizadas"] += 1
-            status = "AUTORIZADA"
-        else:
-            estatisticas["outras"] += 1
-            status = nota.get("situacao", "INDEFINIDO").upper()
+    if PANDAS_DISPONIVEL and len(notas) >= LIMIAR_CLASSIFICACAO_VETORIZADA:
+        # Lotes grandes: classificação vetorizada com pandas
+        contagem, pares_status = classificar_notas_vetorizado(notas)
+    else:
+        contagem = Counter()
         
-        print(f"Nota {nota.get('chave_nfe', 'N/A')[:20]}... possui status: {status}")
+        def classificar():
+            # Classifica e contabiliza sob demanda, produzindo (status, chave) para o UPDATE.
+            # Métodos usados a cada nota ficam em variáveis locais (evita lookups repetidos).
+            obter = dict.get
+            obter_status = MAPA_STATUS.get
+            minusculas = str.lower
+            maiusculas = str.upper
+            
+            for nota in notas:
+                situacao = minusculas(obter(nota, "situacao") or "")
+                status = obter_status(situacao) or maiusculas(situacao) or "INDEFINIDO"
+                contagem[status] += 1
+                yield status, obter(nota, 'chave_nfe')
         
-        if salvar_banco:
-            notas_para_salvar.append({
-                'chave_nfe': nota.get('chave_nfe'),
-                'status': status,
-                'situacao_original': nota.get('situacao')
-            })
+        pares_status = classificar()
+    
+    # Salva no banco se solicitado: executemany consome o gerador diretamente
+    if salvar_banco and notas:
+        salvar_status_banco(pares_status)
+    
+    # Conclui a contagem das notas não consumidas (sem salvar ou após falha no banco)
+    deque(pares_status, maxlen=0)
     
-    # Salva no banco se solicitado
-    if salvar_banco and notas_para_salvar:
-        salvar_status_banco(notas_para_salvar)
+    # Resumo único em vez de uma linha por nota
+    exibir(f"📋 {len(notas)} notas classificadas: {dict(contagem)}")
     
-    return estatisticas
+    if logger.isEnabledFor(logging.DEBUG):
+        for nota in notas[:20]:
+            logger.debug(f"Nota {(nota.get('chave_nfe') or 'N/A')[:20]}... situação: {nota.get('situacao')}")
+    
+    canceladas = contagem["CANCELADA"]
+    autorizadas = contagem["AUTORIZADA"]
+    
+    return {
+        "canceladas": canceladas,
+        "autorizadas": autorizadas,
+        "outras": len(notas) - canceladas - autorizadas,
+        "total": len(notas)
+    }
 
 
-def salvar_status_banco(notas_status: list) -> int:
+def salvar_status_banco(pares_status: Iterable[Tuple[str, Optional[str]]]) -> int:
     """
     Salva status das notas no banco de dados.
+    Recebe pares (status, chave_nfe); pares sem chave são ignorados.
     """
+    global _SCHEMA_STATUS_VERIFICADO
+    
     try:
         with sqlite3.connect("omie.db") as conn:
-            cursor = conn.cursor()
+            # PRAGMAs de performance para escrita em lote (WAL mantém leitores desbloqueados)
+            try:
+                conn.executescript(PRAGMAS_ESCRITA_LOTE)
+            except sqlite3.OperationalError as e:
+                exibir(f"⚠️  Não foi possível aplicar PRAGMAs de performance: {e}")
             
-            # Verifica se coluna status existe
-            cursor.execute("PRAGMA table_info(notas)")
-            colunas = {row[1] for row in cursor.fetchall()}
+            cursor = conn.cursor()
             
-            if 'status' not in colunas:
-                print("⚠️  Coluna 'status' não encontrada. Criando...")
-                cursor.execute("ALTER TABLE notas ADD COLUMN status TEXT DEFAULT NULL")
+            # Verifica se coluna status existe (apenas na primeira chamada do processo)
+            if not _SCHEMA_STATUS_VERIFICADO:
+                cursor.execute("PRAGMA table_info(notas)")
+                colunas = {row[1] for row in cursor.fetchall()}
+                
+                if 'status' not in colunas:
+                    exibir("⚠️  Coluna 'status' não encontrada. Criando...")
+                    cursor.execute("ALTER TABLE notas ADD COLUMN status TEXT DEFAULT NULL")
+                    conn.commit()
+                    exibir("✅ Coluna 'status' criada com sucesso")
+                
+                # Garante índice em cChaveNFe para o UPDATE (mesmo nome do índice criado
+                # por iniciar_db, então é no-op em bancos do pipeline)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_chave_nfe ON notas(cChaveNFe)")
+                cursor.execute("ANALYZE notas")
                 conn.commit()
-                print("✅ Coluna 'status' criada com sucesso")
+                
+                _SCHEMA_STATUS_VERIFICADO = True
             
-            # Atualiza status das notas
+            # Atualiza status das notas em lotes, uma transação por lote
+            # (transações pequenas cabem no cache de páginas e mantêm o WAL curto)
+            pares_validos = (par for par in pares_status if par[1])
             atualizados = 0
-            for nota in notas_status:
-                if nota['chave_nfe']:
-                    cursor.execute("""
-                        UPDATE notas 
-                        SET status = ? 
-                        WHERE cChaveNFe = ?
-                    """, (nota['status'], nota['chave_nfe']))
-                    
-                    if cursor.rowcount > 0:
-                        atualizados += 1
+            lotes = 0
             
-            conn.commit()
-            print(f"📊 {atualizados} registros atualizados no banco")
+            while True:
+                lote = list(islice(pares_validos, TAMANHO_LOTE_UPDATE))
+                if not lote:
+                    break
+                
+                conn.execute("BEGIN IMMEDIATE")
+                cursor.executemany(SQL_UPDATE_STATUS, lote)
+                atualizados += cursor.rowcount
+                conn.commit()
+                
+                lotes += 1
+                if lotes % LOTES_POR_CHECKPOINT == 0:
+                    conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            
+            exibir(f"📊 {atualizados} registros atualizados no banco")
             return atualizados
             
     except Exception as e:
-        print(f"❌ Erro ao salvar no banco: {e}")
+        exibir(f"❌ Erro ao salvar no banco: {e}")
         return 0
 
 
@@ -147,8 +330,8 @@ def exemplo_uso_sincronos():
     """
     Exemplo de uso baseado no seu código original.
     """
-    print("🔄 EXEMPLO DE USO - VERSÃO SÍNCRONA")
-    print("=" * 50)
+    exibir("🔄 EXEMPLO DE USO - VERSÃO SÍNCRONA")
+    exibir("=" * 50)
     
     try:
         # Carrega configurações
@@ -166,37 +349,37 @@ def exemplo_uso_sincronos():
             "data_final": "03/09/2025"
         }
         
-        print(f"🔍 Consultando NFe de {filtros['data_inicial']} a {filtros['data_final']}")
+        exibir(f"🔍 Consultando NFe de {filtros['data_inicial']} a {filtros['data_final']}")
         
         # Chama API
         resultado = verificar_status_nfe_sincronos(auth, filtros)
         
         if "notas" in resultado:
             notas = resultado["notas"]
-            print(f"📊 {len(notas)} notas encontradas")
+            exibir(f"📊 {len(notas)} notas encontradas")
             
             # Processa conforme seu código original
             estatisticas = processar_notas_com_status(notas)
             
-            print(f"\n📈 ESTATÍSTICAS:")
-            print(f"   • Total: {estatisticas['total']}")
-            print(f"   • Canceladas: {estatisticas['canceladas']}")
-            print(f"   • Autorizadas: {estatisticas['autorizadas']}")
-            print(f"   • Outras: {estatisticas['outras']}")
+            exibir(f"\n📈 ESTATÍSTICAS:")
+            exibir(f"   • Total: {estatisticas['total']}")
+            exibir(f"   • Canceladas: {estatisticas['canceladas']}")
+            exibir(f"   • Autorizadas: {estatisticas['autorizadas']}")
+            exibir(f"   • Outras: {estatisticas['outras']}")
             
         else:
-            print("⚠️  Nenhuma nota encontrada na resposta")
+            exibir("⚠️  Nenhuma nota encontrada na resposta")
             
     except Exception as e:
-        print(f"❌ Erro: {e}")
+        exibir(f"❌ Erro: {e}")
 
 
 async def exemplo_uso_async():
     """
     Exemplo usando versão assíncrona otimizada.
     """
-    print("\n🚀 EXEMPLO DE USO - VERSÃO ASSÍNCRONA")
-    print("=" * 50)
+    exibir("\n🚀 EXEMPLO DE USO - VERSÃO ASSÍNCRONA")
+    exibir("=" * 50)
     
     try:
         # Carrega configurações
@@ -214,29 +397,66 @@ async def exemplo_uso_async():
             "data_final": "03/09/2025"
         }
         
-        print(f"🔍 Consultando NFe (async) de {filtros['data_inicial']} a {filtros['data_final']}")
+        exibir(f"🔍 Consultando NFe (async) de {filtros['data_inicial']} a {filtros['data_final']}")
         
-        # Chama API assíncrona
-        resultado = await verificar_status_nfe_async(auth, filtros)
+        # Chama API assíncrona (sessão única, conexões reaproveitadas).
+        # Conexões por host limitadas à concorrência de páginas: as requisições
+        # simultâneas se revezam em poucos sockets keep-alive em vez de abrir novos.
+        connector = aiohttp.TCPConnector(
+            limit=20,
+            limit_per_host=MAX_PAGINAS_SIMULTANEAS,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
+        async with aiohttp.ClientSession(connector=connector) as session:
+            semaforo = asyncio.Semaphore(MAX_PAGINAS_SIMULTANEAS)
+            
+            # A primeira página informa o total de páginas
+            resultado = await consultar_pagina_limitada(session, semaforo, auth, filtros, 1)
+            total_paginas = resultado.get("total_de_paginas", 1)
+            
+            # Demais páginas em paralelo, limitadas pelo semáforo
+            if "notas" in resultado and total_paginas > 1:
+                exibir(f"📄 Consultando {total_paginas - 1} páginas adicionais em paralelo...")
+                
+                async def consultar(pagina: int) -> Dict[str, Any]:
+                    return await consultar_pagina_limitada(session, semaforo, auth, filtros, pagina)
+                
+                paginas_restantes = range(2, total_paginas + 1)
+                
+                if AIOMETER_DISPONIVEL:
+                    # Mantém a janela de concorrência cheia respeitando requisições/segundo
+                    async with aiometer.amap(
+                        consultar,
+                        paginas_restantes,
+                        max_at_once=MAX_PAGINAS_SIMULTANEAS,
+                        max_per_second=MAX_PAGINAS_POR_SEGUNDO
+                    ) as paginas:
+                        async for pagina in paginas:
+                            resultado["notas"].extend(pagina.get("notas", []))
+                else:
+                    paginas = await asyncio.gather(*[consultar(pagina) for pagina in paginas_restantes])
+                    for pagina in paginas:
+                        resultado["notas"].extend(pagina.get("notas", []))
         
         if "notas" in resultado:
             notas = resultado["notas"]
-            print(f"📊 {len(notas)} notas encontradas")
+            exibir(f"📊 {len(notas)} notas encontradas")
             
             # Processa e salva no banco
             estatisticas = processar_notas_com_status(notas, salvar_banco=True)
             
-            print(f"\n📈 ESTATÍSTICAS (SALVO NO BANCO):")
-            print(f"   • Total: {estatisticas['total']}")
-            print(f"   • Canceladas: {estatisticas['canceladas']}")
-            print(f"   • Autorizadas: {estatisticas['autorizadas']}")
-            print(f"   • Outras: {estatisticas['outras']}")
+            exibir(f"\n📈 ESTATÍSTICAS (SALVO NO BANCO):")
+            exibir(f"   • Total: {estatisticas['total']}")
+            exibir(f"   • Canceladas: {estatisticas['canceladas']}")
+            exibir(f"   • Autorizadas: {estatisticas['autorizadas']}")
+            exibir(f"   • Outras: {estatisticas['outras']}")
             
         else:
-            print("⚠️  Nenhuma nota encontrada na resposta")
+            exibir("⚠️  Nenhuma nota encontrada na resposta")
             
     except Exception as e:
-        print(f"❌ Erro: {e}")
+        exibir(f"❌ Erro: {e}")
 
 
 def exemplo_integração_sistema():
@@ -279,6 +499,21 @@ def exemplo_integração_sistema():
         print("💡 Execute primeiro: Certifique-se que todos os arquivos foram criados")
 
 
+async def executar_com_saida_propria(exemplo: Callable[[], Awaitable[None]]) -> None:
+    """
+    Executa o exemplo acumulando a saída num buffer próprio e a imprime ao final,
+    para que exemplos concorrentes não intercalem linhas. O buffer fica num
+    ContextVar da task (herdado por asyncio.to_thread); sys.stdout não é trocado.
+    """
+    buffer = io.StringIO()
+    _SAIDA_EXEMPLO.set(buffer)
+    try:
+        await exemplo()
+    finally:
+        sys.stdout.write(buffer.getvalue())
+        sys.stdout.flush()
+
+
 async def main():
     """Função principal que executa todos os exemplos."""
     
@@ -287,11 +522,13 @@ async def main():
     print("Baseado no código fornecido e integração com o sistema existente")
     print()
     
-    # Exemplo 1: Versão síncrona (seu código original)
-    exemplo_uso_sincronos()
-    
-    # Exemplo 2: Versão assíncrona otimizada
-    await exemplo_uso_async()
+    # Exemplo 1: Versão síncrona (seu código original), em thread para não bloquear o loop
+    # Exemplo 2: Versão assíncrona otimizada, executada em paralelo com o exemplo 1.
+    # Cada um escreve no seu buffer, impresso inteiro quando o exemplo termina.
+    await asyncio.gather(
+        executar_com_saida_propria(lambda: asyncio.to_thread(exemplo_uso_sincronos)),
+        executar_com_saida_propria(exemplo_uso_async)
+    )
     
     # Exemplo 3: Integração com sistema
     exemplo_integração_sistema()
@@ -307,4 +544,8 @@ async def main():
 
 if __name__ == "__main__":
     print("Executando exemplos de uso do sistema de status...")
-    asyncio.run(main())
+    # uvloop (quando instalado) reduz o overhead do event loop
+    if UVLOOP_DISPONIVEL:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
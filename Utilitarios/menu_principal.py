@@ -9,9 +9,15 @@ Oferece interface interativa para acesso rápido a todas as funcionalidades.
 
 import os
 import sys
+import ast
+import logging
+import runpy
 import subprocess
 from pathlib import Path
 
+# Resultado da checagem de main() por script, pela versão do arquivo (caminho, mtime)
+_POSSUI_MAIN = {}
+
 def limpar_tela():
     """Limpa a tela do terminal"""
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -23,16 +29,80 @@ def exibir_header():
     print("=" * 70)
     print()
 
+def possui_funcao_main(caminho_script):
+    """Indica se o script define uma função main() no nível do módulo"""
+    caminho = Path(caminho_script)
+    chave = (str(caminho.resolve()), caminho.stat().st_mtime_ns)
+    
+    # Analisa cada versão do arquivo uma única vez por sessão do menu
+    if chave not in _POSSUI_MAIN:
+        arvore = ast.parse(caminho.read_text(encoding='utf-8'))
+        _POSSUI_MAIN[chave] = any(
+            isinstance(no, (ast.FunctionDef, ast.AsyncFunctionDef)) and no.name == "main"
+            for no in arvore.body
+        )
+    
+    return _POSSUI_MAIN[chave]
+
+def executar_em_processo(caminho_script):
+    """
+    Executa o script no próprio processo, sem iniciar um novo interpretador.
+    
+    O script roda como __main__ (runpy), com o mesmo bloco de inicialização e a
+    mesma semântica de sys.exit() da execução por subprocess. sys.argv, sys.path
+    e os handlers/nível do logger raiz são restaurados ao final.
+    Retorna o código de saída, ou None se o script não expõe main().
+    """
+    # Só scripts com main() rodam no processo; os demais seguem por subprocess
+    if not possui_funcao_main(caminho_script):
+        return None
+    
+    raiz = logging.getLogger()
+    handlers_originais = raiz.handlers[:]
+    nivel_original = raiz.level
+    argv_original = sys.argv
+    path_original = list(sys.path)
+    
+    # Mesmo sys.path[0] que o script teria ao ser executado diretamente
+    sys.path.insert(0, str(Path(caminho_script).resolve().parent))
+    sys.argv = [caminho_script]
+    try:
+        runpy.run_path(caminho_script, run_name="__main__")
+        return 0
+    except SystemExit as e:
+        # Mesma conversão do interpretador: None -> 0, int -> código, demais -> stderr e 1
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    finally:
+        sys.argv = argv_original
+        sys.path[:] = path_original
+        
+        # Handlers adicionados pelo script (basicConfig, arquivos de log) não ficam no menu
+        for handler in raiz.handlers[:]:
+            if handler not in handlers_originais:
+                raiz.removeHandler(handler)
+                handler.close()
+        raiz.handlers[:] = handlers_originais
+        raiz.setLevel(nivel_original)
+
 def executar_script(caminho_script):
     """Executa um script Python"""
     try:
         if Path(caminho_script).exists():
             print(f"🚀 Executando: {Path(caminho_script).name}")
             print("-" * 50)
-            result = subprocess.run([sys.executable, caminho_script], 
-                                  capture_output=False, text=True)
+            codigo = executar_em_processo(caminho_script)
+            if codigo is None:
+                # Script sem main(): executa em um interpretador separado
+                result = subprocess.run([sys.executable, caminho_script], 
+                                      capture_output=False, text=True)
+                codigo = result.returncode
             print("-" * 50)
-            print(f"✅ Script concluído com código: {result.returncode}")
+            print(f"✅ Script concluído com código: {codigo}")
             input("\nPressione Enter para continuar...")
         else:
             print(f"❌ Erro: Script não encontrado: {caminho_script}")
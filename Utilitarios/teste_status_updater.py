@@ -4,19 +4,40 @@ TESTE DO SISTEMA DE ATUALIZAÇÃO DE STATUS NFE
 Valida a funcionalidade de consulta e atualização de status das NFe.
 """
 
+import io
 import sys
 import logging
+import importlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import sqlite3
 
 # Adiciona o diretório raiz ao path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# Contagens de verificar_estrutura_banco agregadas numa só varredura;
+# COALESCE cobre o SUM nulo de tabela vazia
+SQL_ESTATISTICAS = """
+    SELECT COUNT(*),
+           COALESCE(SUM(xml_baixado = 1), 0),
+           COALESCE(SUM(status IS NOT NULL AND status != ''), 0),
+           COALESCE(SUM(status IS NULL OR status = ''), 0)
+    FROM notas
+"""
+
 
-def verificar_dependencias():
+def _executar_capturado(funcao_teste):
+    """Executa um teste com buffer de saída próprio; retorna (resultado, erro, texto)."""
+    saida = io.StringIO()
+    try:
+        return funcao_teste(saida), None, saida.getvalue()
+    except Exception as e:
+        return False, e, saida.getvalue()
+
+
+def verificar_dependencias(saida):
     """Verifica se as dependências necessárias estão disponíveis."""
-    print("🔍 VERIFICANDO DEPENDÊNCIAS...")
-    print("=" * 50)
+    print("🔍 VERIFICANDO DEPENDÊNCIAS...", file=saida)
+    print("=" * 50, file=saida)
     
     dependencias = [
         ("aiohttp", "Requisições HTTP assíncronas"),
@@ -29,110 +50,96 @@ def verificar_dependencias():
     
     for modulo, descricao in dependencias:
         try:
-            if modulo == "aiohttp":
-                import aiohttp
-            elif modulo == "asyncio":
-                import asyncio
-            elif modulo == "sqlite3":
-                import sqlite3
-            elif modulo == "configparser":
-                import configparser
-            
-            print(f"   ✅ {modulo:<15} {descricao}")
+            importlib.import_module(modulo)
+            print(f"   ✅ {modulo:<15} {descricao}", file=saida)
         except ImportError as e:
-            print(f"   ❌ {modulo:<15} AUSENTE - {descricao}")
-            print(f"      Erro: {e}")
+            print(f"   ❌ {modulo:<15} AUSENTE - {descricao}", file=saida)
+            print(f"      Erro: {e}", file=saida)
             if modulo == "aiohttp":
-                print(f"      💡 Instale com: pip install aiohttp")
+                print(f"      💡 Instale com: pip install aiohttp", file=saida)
                 todas_ok = False
     
     return todas_ok
 
 
-def verificar_estrutura_banco():
+def verificar_estrutura_banco(saida):
     """Verifica se a estrutura do banco suporta status."""
     
-    print("\n🔍 VERIFICANDO ESTRUTURA DO BANCO...")
-    print("=" * 50)
+    print("\n🔍 VERIFICANDO ESTRUTURA DO BANCO...", file=saida)
+    print("=" * 50, file=saida)
     
     try:
         if not Path("omie.db").exists():
-            print("❌ Arquivo omie.db não encontrado!")
-            print("💡 Execute o pipeline principal primeiro para criar o banco")
+            print("❌ Arquivo omie.db não encontrado!", file=saida)
+            print("💡 Execute o pipeline principal primeiro para criar o banco", file=saida)
             return False
         
-        with sqlite3.connect("omie.db") as conn:
-            cursor = conn.cursor()
-            
-            # Verifica se tabela existe
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='notas'")
-            if not cursor.fetchone():
-                print("❌ Tabela 'notas' não encontrada!")
-                return False
-            
-            # Verifica colunas
-            cursor.execute("PRAGMA table_info(notas)")
-            colunas = {row[1]: row[2] for row in cursor.fetchall()}
-            
-            print("📋 COLUNAS DA TABELA:")
-            campos_essenciais = ['cChaveNFe', 'nIdNF', 'status', 'xml_baixado']
-            
-            for campo in campos_essenciais:
-                if campo in colunas:
-                    print(f"   ✅ {campo:<20} {colunas[campo]}")
-                else:
-                    print(f"   ❌ {campo:<20} AUSENTE!")
-                    if campo == 'status':
-                        print("      💡 Adicionando coluna 'status'...")
-                        try:
-                            cursor.execute("ALTER TABLE notas ADD COLUMN status TEXT DEFAULT NULL")
-                            conn.commit()
-                            print("      ✅ Coluna 'status' adicionada com sucesso")
-                        except Exception as e:
-                            print(f"      ❌ Erro ao adicionar coluna: {e}")
-                            return False
-            
-            # Estatísticas
-            cursor.execute("SELECT COUNT(*) FROM notas")
-            total = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM notas WHERE xml_baixado = 1")
-            com_xml = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM notas WHERE status IS NOT NULL AND status != ''")
-            com_status = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM notas WHERE status IS NULL OR status = ''")
-            sem_status = cursor.fetchone()[0]
-            
-            print(f"\n📊 ESTATÍSTICAS:")
-            print(f"   • Total de registros: {total:,}")
-            print(f"   • Com XML baixado: {com_xml:,}")
-            print(f"   • Com status: {com_status:,}")
-            print(f"   • Sem status: {sem_status:,}")
-            
-            if sem_status > 0:
-                print(f"\n💡 {sem_status:,} registros podem ser atualizados com status")
+        from src.db_pool import get_conn
+        conn = get_conn()
+        cursor = conn.cursor()
+        
+        # Colunas (nome -> tipo) lidas direto do cursor; sem linhas = tabela inexistente
+        colunas = {row[1]: row[2] for row in cursor.execute("PRAGMA table_info(notas)")}
+        if not colunas:
+            print("❌ Tabela 'notas' não encontrada!", file=saida)
+            return False
+        
+        print("📋 COLUNAS DA TABELA:", file=saida)
+        campos_essenciais = ['cChaveNFe', 'nIdNF', 'status', 'xml_baixado']
+        
+        for campo in campos_essenciais:
+            if campo in colunas:
+                print(f"   ✅ {campo:<20} {colunas[campo]}", file=saida)
             else:
-                print(f"\n✅ Todos os registros já possuem status")
-            
-            return True
-            
+                print(f"   ❌ {campo:<20} AUSENTE!", file=saida)
+                if campo == 'status':
+                    print("      💡 Adicionando coluna 'status'...", file=saida)
+                    try:
+                        cursor.execute("ALTER TABLE notas ADD COLUMN status TEXT DEFAULT NULL")
+                        conn.commit()
+                        print("      ✅ Coluna 'status' adicionada com sucesso", file=saida)
+                    except Exception as e:
+                        print(f"      ❌ Erro ao adicionar coluna: {e}", file=saida)
+                        return False
+        
+        # Índice parcial das notas pendentes de status (usado pelo atualizador)
+        try:
+            from src.utils import SQL_INDICE_STATUS_ELEGIVEL
+            cursor.execute(SQL_INDICE_STATUS_ELEGIVEL)
+        except Exception as e:
+            print(f"   ⚠️ Não foi possível criar índice idx_status_eligible: {e}", file=saida)
+        
+        # Estatísticas (uma única varredura)
+        total, com_xml, com_status, sem_status = cursor.execute(SQL_ESTATISTICAS).fetchone()
+        
+        print(f"\n📊 ESTATÍSTICAS:", file=saida)
+        print(f"   • Total de registros: {total:,}", file=saida)
+        print(f"   • Com XML baixado: {com_xml:,}", file=saida)
+        print(f"   • Com status: {com_status:,}", file=saida)
+        print(f"   • Sem status: {sem_status:,}", file=saida)
+        
+        if sem_status > 0:
+            print(f"\n💡 {sem_status:,} registros podem ser atualizados com status", file=saida)
+        else:
+            print(f"\n✅ Todos os registros já possuem status", file=saida)
+        
+        return True
+        
     except Exception as e:
-        print(f"❌ Erro ao verificar banco: {e}")
+        print(f"❌ Erro ao verificar banco: {e}", file=saida)
         return False
 
 
-def testar_configuracao():
+def testar_configuracao(saida):
     """Testa se as configurações estão corretas."""
     
-    print("\n⚙️  VERIFICANDO CONFIGURAÇÕES...")
-    print("=" * 50)
+    print("\n⚙️  VERIFICANDO CONFIGURAÇÕES...", file=saida)
+    print("=" * 50, file=saida)
     
     try:
         config_path = Path("configuracao.ini")
         if not config_path.exists():
-            print("❌ Arquivo configuracao.ini não encontrado!")
+            print("❌ Arquivo configuracao.ini não encontrado!", file=saida)
             return False
         
         import configparser
@@ -141,7 +148,7 @@ def testar_configuracao():
         
         # Verifica seção omie_api
         if not config.has_section('omie_api'):
-            print("❌ Seção [omie_api] não encontrada!")
+            print("❌ Seção [omie_api] não encontrada!", file=saida)
             return False
         
         # Verifica campos essenciais
@@ -151,26 +158,26 @@ def testar_configuracao():
             valor = config.get('omie_api', campo, fallback=None)
             if valor:
                 valor_mascarado = valor[:10] + "..." if len(valor) > 10 else valor
-                print(f"   ✅ {campo:<15} {valor_mascarado}")
+                print(f"   ✅ {campo:<15} {valor_mascarado}", file=saida)
             else:
-                print(f"   ❌ {campo:<15} AUSENTE!")
+                print(f"   ❌ {campo:<15} AUSENTE!", file=saida)
                 return False
         
         calls_per_second = config.getint('omie_api', 'calls_per_second', fallback=4)
-        print(f"   ✅ calls_per_second  {calls_per_second}")
+        print(f"   ✅ calls_per_second  {calls_per_second}", file=saida)
         
         return True
         
     except Exception as e:
-        print(f"❌ Erro ao verificar configurações: {e}")
+        print(f"❌ Erro ao verificar configurações: {e}", file=saida)
         return False
 
 
-def testar_importacao_modulos():
+def testar_importacao_modulos(saida):
     """Testa se os módulos do sistema podem ser importados."""
     
-    print("\n📦 TESTANDO IMPORTAÇÃO DOS MÓDULOS...")
-    print("=" * 50)
+    print("\n📦 TESTANDO IMPORTAÇÃO DOS MÓDULOS...", file=saida)
+    print("=" * 50, file=saida)
     
     modulos = [
         ("src.omie_client_async", "Cliente API Omie"),
@@ -183,27 +190,27 @@ def testar_importacao_modulos():
     for modulo, descricao in modulos:
         try:
             __import__(modulo)
-            print(f"   ✅ {modulo:<25} {descricao}")
+            print(f"   ✅ {modulo:<25} {descricao}", file=saida)
         except ImportError as e:
-            print(f"   ❌ {modulo:<25} ERRO - {e}")
+            print(f"   ❌ {modulo:<25} ERRO - {e}", file=saida)
             if "aiohttp" in str(e):
-                print(f"      💡 Instale dependências: pip install aiohttp")
+                print(f"      💡 Instale dependências: pip install aiohttp", file=saida)
             todos_ok = False
         except Exception as e:
-            print(f"   ⚠️  {modulo:<25} AVISO - {e}")
+            print(f"   ⚠️  {modulo:<25} AVISO - {e}", file=saida)
     
     return todos_ok
 
 
-def executar_teste_simples():
+def executar_teste_simples(saida):
     """Executa teste simples da funcionalidade."""
     
-    print("\n🧪 TESTE SIMPLES DE FUNCIONALIDADE...")
-    print("=" * 50)
+    print("\n🧪 TESTE SIMPLES DE FUNCIONALIDADE...", file=saida)
+    print("=" * 50, file=saida)
     
     try:
         # Testa normalização de status (função simples)
-        print("📋 Testando normalização de status:")
+        print("📋 Testando normalização de status:", file=saida)
         
         testes_status = [
             ("cancelada", "CANCELADA"),
@@ -213,39 +220,21 @@ def executar_teste_simples():
             ("status_desconhecido", "STATUS_DESCONHECIDO"),
         ]
         
-        def normalizar_status_teste(status_raw: str) -> str:
-            """Função de teste para normalização."""
-            if not status_raw:
-                return "INDEFINIDO"
-                
-            status_lower = status_raw.lower().strip()
-            
-            mapeamentos = {
-                "cancelada": "CANCELADA",
-                "autorizada": "AUTORIZADA", 
-                "rejeitada": "REJEITADA",
-                "processando": "PROCESSANDO",
-            }
-            
-            for palavra_chave, status_norm in mapeamentos.items():
-                if palavra_chave in status_lower:
-                    return status_norm
-                    
-            return status_raw.upper()
+        from src.utils import normalizar_status_nfe as normalizar_status_teste
         
         todos_ok = True
         for entrada, esperado in testes_status:
             resultado = normalizar_status_teste(entrada)
             if resultado == esperado:
-                print(f"   ✅ {entrada:<20} -> {resultado}")
+                print(f"   ✅ {entrada:<20} -> {resultado}", file=saida)
             else:
-                print(f"   ❌ {entrada:<20} -> {resultado} (esperado: {esperado})")
+                print(f"   ❌ {entrada:<20} -> {resultado} (esperado: {esperado})", file=saida)
                 todos_ok = False
         
         return todos_ok
         
     except Exception as e:
-        print(f"❌ Erro no teste simples: {e}")
+        print(f"❌ Erro no teste simples: {e}", file=saida)
         return False
 
 
@@ -274,20 +263,27 @@ def main():
     
     resultados = []
     
-    for nome_teste, funcao_teste in testes:
+    # Testes independentes (disco, banco, INI, imports) executados em paralelo;
+    # cada um escreve no próprio buffer (exibido na ordem original) e, via
+    # get_conn, usa a conexão SQLite da sua thread
+    with ThreadPoolExecutor(max_workers=len(testes)) as executor:
+        execucoes = list(executor.map(
+            lambda teste: _executar_capturado(teste[1]), testes
+        ))
+    
+    for (nome_teste, _), (resultado, erro, texto) in zip(testes, execucoes):
         print(f"\n{'='*20} {nome_teste.upper()} {'='*20}")
-        try:
-            resultado = funcao_teste()
-            resultados.append((nome_teste, resultado))
-            
-            if resultado:
-                print(f"✅ {nome_teste}: PASSOU")
-            else:
-                print(f"❌ {nome_teste}: FALHOU")
-                
-        except Exception as e:
-            print(f"❌ {nome_teste}: ERRO - {e}")
-            resultados.append((nome_teste, False))
+        print(texto, end="")
+        
+        if erro is not None:
+            print(f"❌ {nome_teste}: ERRO - {erro}")
+            resultado = False
+        elif resultado:
+            print(f"✅ {nome_teste}: PASSOU")
+        else:
+            print(f"❌ {nome_teste}: FALHOU")
+        
+        resultados.append((nome_teste, resultado))
     
     # Relatório final
     print("\n" + "=" * 60)
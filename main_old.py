@@ -29,6 +29,7 @@ Caracteristicas tecnicas:
 import asyncio
 import configparser
 import html
+import importlib
 import locale
 import logging
 import os
@@ -39,15 +40,29 @@ import re
 import signal
 import requests
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, NamedTuple, Tuple
+from types import MappingProxyType, ModuleType
+from typing import Any, Dict, List, Mapping, Optional, NamedTuple, Tuple
 from dataclasses import dataclass
 from contextlib import contextmanager
 import xml.etree.ElementTree as ET
 import threading
+
+# Event loop baseado em libuv (opcional; não existe no Windows)
+try:
+    import uvloop
+    UVLOOP_DISPONIVEL = True
+except ImportError:
+    uvloop = None
+    UVLOOP_DISPONIVEL = False
+
 from src.utils import (
+    atualizar_anomesdia,
     atualizar_campos_registros_pendentes, 
     conexao_otimizada,
+    exibir_metricas_completas,
+    iniciar_db,
     limpar_cache_indexacao_xmls,
     obter_estatisticas_cache,
     gerar_xml_path_otimizado
@@ -62,6 +77,18 @@ from src.path_resolver import PathResolver
 # Imports feitos sob demanda para evitar dependências circulares
 # Os módulos serão importados nas funções específicas que os utilizam
 
+# Referências dos módulos locais já importados sob demanda; evita repassar pela
+# maquinaria de import a cada execução de etapa (e não importa o que não for usado,
+# já que alguns módulos leem o INI ao serem importados)
+_MODULOS_LOCAIS: Dict[str, ModuleType] = {}
+
+def _modulo_local(nome: str) -> ModuleType:
+    """Importa o módulo local na primeira chamada e devolve a referência guardada nas seguintes."""
+    modulo = _MODULOS_LOCAIS.get(nome)
+    if modulo is None:
+        modulo = _MODULOS_LOCAIS[nome] = importlib.import_module(nome)
+    return modulo
+
 # =============================================================================
 # Configurações globais e constantes
 # =============================================================================
@@ -85,6 +112,27 @@ SQLITE_PRAGMAS: Dict[str, str] = {
     "query_planner": "1",       # Habilita query planner
 }
 
+# Índices usados pelas contagens e pela verificação de XMLs (mesmos nomes/definições
+# de criar_indices_otimizados em src.utils): parciais para pendentes e vazios e o de
+# cobertura para as contagens por flag
+INDICES_VERIFICACAO: Dict[str, str] = {
+    "idx_pendentes": "CREATE INDEX IF NOT EXISTS idx_pendentes ON notas(xml_baixado) WHERE xml_baixado = 0",
+    "idx_xml_vazio": "CREATE INDEX IF NOT EXISTS idx_xml_vazio ON notas(xml_vazio) WHERE xml_vazio = 1",
+    "idx_notas_flags": "CREATE INDEX IF NOT EXISTS idx_notas_flags ON notas(xml_baixado, xml_vazio)",
+}
+
+# PRAGMAs acima montados uma vez como script para executescript()
+_SQL_PRAGMAS_OTIMIZADOS: str = "".join(f"PRAGMA {p} = {v};" for p, v in SQLITE_PRAGMAS.items())
+
+# Contagens por flag de XML em uma única varredura (coberta por idx_notas_flags):
+# (baixados, pendentes, vazios)
+SQL_CONTAGEM_FLAGS_XML: str = """
+    SELECT COALESCE(SUM(xml_baixado = 1), 0),
+           COALESCE(SUM(xml_baixado = 0), 0),
+           COALESCE(SUM(xml_vazio = 1), 0)
+    FROM notas
+"""
+
 # Instância global do PathResolver (será inicializada na main)
 path_resolver: Optional[PathResolver] = None
 
@@ -100,6 +148,27 @@ def inicializar_path_resolver() -> PathResolver:
         path_resolver.validar_ambiente()
     return path_resolver
 
+class CaminhosPipeline(NamedTuple):
+    """Caminhos resolvidos uma vez e compartilhados pelas etapas do pipeline."""
+    db_path: Path
+    resultado_dir: Path
+    config_ini: Path
+
+@lru_cache(maxsize=1)
+def _caminhos() -> CaminhosPipeline:
+    """
+    Resolve banco, pasta de resultados e INI pelo PathResolver uma única vez.
+    
+    get_path_by_key faz resolve() e mkdir a cada chamada; as etapas usam este
+    resultado em cache. Limpo junto com o cache de configurações.
+    """
+    resolver = inicializar_path_resolver()
+    return CaminhosPipeline(
+        db_path=resolver.get_path_by_key("db_name"),
+        resultado_dir=resolver.get_path_by_key("resultado_dir"),
+        config_ini=resolver.config_file,
+    )
+
 # =============================================================================
 # Configuracoo de logging estruturado
 # =============================================================================
@@ -176,10 +245,13 @@ def configurar_logging() -> None:
         )
         logging.warning(f"[PIPELINE.CONFIG] Usando configuração básica devido a: {e}")
 
+@lru_cache(maxsize=1)
 def _detectar_encoding_console() -> str:
     """
     Detecta encoding do console de forma robusta e simples.
     
+    O resultado é memoizado: o console não muda durante a execução.
+    
     Estratégia:
     1. Tenta encoding do stdout se disponível
     2. Fallback para encoding preferido do sistema  
@@ -201,12 +273,11 @@ def _detectar_encoding_console() -> str:
                 return encoding
         
         # Prioridade 2: Encoding preferido do sistema
-        import locale
         system_encoding = locale.getpreferredencoding()
         if system_encoding:
             return system_encoding.lower()
             
-    except (AttributeError, ImportError):
+    except AttributeError:
         pass
     
     # Fallback universal
@@ -262,100 +333,383 @@ def formatar_tempo_total(segundos: float) -> str:
     """
     if segundos < 0:
         return "0s"
+    return _formatar_segundos_inteiros(int(segundos))
+
+@lru_cache(maxsize=4096)
+def _formatar_segundos_inteiros(total: int) -> str:
+    """Formata segundos inteiros; memoizado pois os mesmos valores se repetem nos logs."""
+    minutos, segs = divmod(total, 60)
+    horas, minutos = divmod(minutos, 60)
     
-    horas = int(segundos // 3600)
-    minutos = int((segundos % 3600) // 60)
-    segs = int(segundos % 60)
-    
-    if horas > 0:
+    if horas:
         return f"{horas}h {minutos}m {segs}s"
-    elif minutos > 0:
-        return f"{minutos}m {segs}s"
-    else:
-        return f"{segs}s"
+    return f"{minutos}m {segs}s" if minutos else f"{segs}s"
+
+class _Cronometro:
+    """
+    Cronômetro monotônico (perf_counter_ns) das etapas do pipeline.
+    
+    str(cronometro) devolve "<tempo formatado> (<segundos>s)" já no formato
+    usado pelos logs de conclusão.
+    """
+    __slots__ = ("_inicio_ns",)
+    
+    def __init__(self) -> None:
+        self._inicio_ns = time.perf_counter_ns()
+    
+    @property
+    def segundos(self) -> float:
+        return (time.perf_counter_ns() - self._inicio_ns) / 1e9
+    
+    def __str__(self) -> str:
+        segundos = self.segundos
+        return f"{formatar_tempo_total(segundos)} ({segundos:.2f}s)"
+
+# =============================================================================
+# Utilitários de varredura de diretórios
+# =============================================================================
+def _contar_arquivos_por_sufixo(raiz: Path, sufixos: Tuple[str, ...]) -> Tuple[int, ...]:
+    """
+    Conta, em uma única varredura recursiva, os arquivos de cada sufixo.
+    
+    Usa os.scandir com pilha explícita: nenhum Path nem lista de arquivos é
+    criada e o tipo vem do DirEntry (sem stat extra). O nome passa por
+    os.path.normcase para manter o casamento sem distinção de caixa do
+    rglob no Windows.
+    
+    Returns:
+        Tuple[int, ...]: Quantidade por sufixo, na mesma ordem de `sufixos`
+    """
+    contagens = [0] * len(sufixos)
+    pendentes = [os.fspath(raiz)]
+    while pendentes:
+        try:
+            with os.scandir(pendentes.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        pendentes.append(entry.path)
+                        continue
+                    nome = os.path.normcase(entry.name)
+                    for i, sufixo in enumerate(sufixos):
+                        if nome.endswith(sufixo):
+                            contagens[i] += 1
+                            break
+        except (FileNotFoundError, PermissionError, NotADirectoryError):
+            continue
+    return tuple(contagens)
+
+def _iterar_arquivos_com_stat(raiz: Path, sufixo: str):
+    """
+    Gera (Path, os.stat_result) dos arquivos com o sufixo, recursivamente.
+    
+    Preguiçoso: quem só precisa saber se há algum arquivo para no primeiro.
+    O stat vem de DirEntry.stat(), que no Windows já está em cache da varredura.
+    """
+    pendentes = [os.fspath(raiz)]
+    while pendentes:
+        try:
+            with os.scandir(pendentes.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        pendentes.append(entry.path)
+                    elif os.path.normcase(entry.name).endswith(sufixo):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            # Removido durante a varredura
+                            continue
+                        yield Path(entry.path), st
+        except (FileNotFoundError, PermissionError, NotADirectoryError):
+            continue
 
 # =============================================================================
 # Gerenciamento de configurações do sistema
 # =============================================================================
-from pathlib import Path
 
-def carregar_configuracoes(config_path: str = "configuracao.ini") -> dict:
+# Configuração completa carregada do INI: seção -> chave -> valor já convertido,
+# em mapeamentos somente leitura (a mesma instância do cache é compartilhada)
+Config = Mapping[str, Mapping[str, Any]]
+
+# Cache das configurações já interpretadas, chaveado por (caminho, mtime_ns, tamanho);
+# guarda apenas as últimas versões do arquivo
+_CONFIG_CACHE: Dict[Tuple[str, int, int], Config] = {}
+_CONFIG_CACHE_MAX = 4
+
+# Cache do INI bruto (seção -> chave -> texto), mesma chave e limite do cache acima;
+# atende quem precisa de seções/chaves fora do esquema sem reler o arquivo
+_PARSER_CACHE: Dict[Tuple[str, int, int], MappingProxyType] = {}
+
+# Candidatos do arquivo padrão resolvidos uma única vez (cwd e pasta do main_old.py);
+# o caminho encontrado fica memorizado para as chamadas seguintes
+_CANDIDATOS_CONFIG_PADRAO: Tuple[str, ...] = (
+    os.path.abspath(CONFIG_PATH),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), CONFIG_PATH),
+)
+_RESOLVED_CONFIG_PATH: Optional[str] = None
+
+# Chamadas seguidas ao arquivo padrão dentro desta janela (segundos) devolvem o
+# último resultado sem nenhuma syscall (nem open/fstat)
+_CONFIG_TTL = 1.0
+_LAST_STAT_TIME = 0.0
+_LAST_RESULT: Optional[Config] = None
+
+def carregar_configuracoes(config_path: str = "configuracao.ini") -> Config:
     """
     Carrega configurações com busca automática do arquivo.
     Usa o mesmo sistema de busca do PathResolver para compatibilidade.
+    
+    O resultado é reaproveitado enquanto o arquivo não mudar (mtime/tamanho).
+    É devolvido em mapeamentos somente leitura (MappingProxyType), então a
+    mesma instância do cache é compartilhada sem cópias.
+    Para o arquivo padrão, chamadas a menos de _CONFIG_TTL segundos da última
+    verificação nem consultam o disco.
     """
+    global _RESOLVED_CONFIG_PATH, _LAST_STAT_TIME, _LAST_RESULT
+    
+    padrao = config_path == CONFIG_PATH
+    if padrao and _LAST_RESULT is not None and time.monotonic() - _LAST_STAT_TIME < _CONFIG_TTL:
+        return _LAST_RESULT
+    
     # Busca o arquivo nos mesmos locais que o PathResolver
-    locais_possiveis = [
-        Path(config_path),  # Caminho atual/absoluto
-        Path(__file__).parent / config_path,  # Ao lado do main_old.py
-        Path.cwd() / config_path,  # Diretório atual
-    ]
+    if padrao:
+        locais_possiveis = _CANDIDATOS_CONFIG_PADRAO
+        if _RESOLVED_CONFIG_PATH:
+            locais_possiveis = (_RESOLVED_CONFIG_PATH,) + locais_possiveis
+    else:
+        # Candidatos como str: sem objetos Path nem coerções str() depois
+        config_path = os.fspath(config_path)
+        locais_possiveis = (
+            config_path,  # Caminho atual/absoluto
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), config_path),  # Ao lado do main_old.py
+            os.path.join(os.getcwd(), config_path),  # Diretório atual
+        )
     
-    config_file = None
+    # EAFP: abre direto o primeiro candidato existente (sem stat prévio por candidato)
+    config_file: Optional[str] = None
     for local in locais_possiveis:
-        if local.exists():
-            config_file = local
-            break
+        try:
+            fh = open(local, 'rb')
+        except FileNotFoundError:
+            continue
+        config_file = local
+        break
     
     if not config_file:
         raise FileNotFoundError(f"Arquivo de configuração não encontrado: {config_path}")
 
-    config = configparser.ConfigParser()
-    config.read(config_file, encoding='utf-8')
-
-    # Leitura de todas as seções e conversão de tipos
-    return {
-        "paths": {
-            "resultado_dir": config.get("paths", "resultado_dir", fallback="resultado"),
-            "db_name": config.get("paths", "db_name", fallback="omie.db"),
-            "log_dir": config.get("paths", "log_dir", fallback="log"),
-            "temp_dir": config.get("paths", "temp_dir", fallback="temp"),
-        },
-        "compactador": {
-            "arquivos_por_pasta": config.getint("compactador", "arquivos_por_pasta", fallback=10000),
-            "max_workers": config.getint("compactador", "max_workers", fallback=4),
-            "batch_size": config.getint("compactador", "batch_size", fallback=1000),
-        },
-        "ONEDRIVE": {
-            "upload_onedrive": config.getboolean("ONEDRIVE", "upload_onedrive", fallback=False),
-            "pasta_destino": config.get("ONEDRIVE", "pasta_destino", fallback="Documentos Compartilhados"),
-            "upload_max_retries": config.getint("ONEDRIVE", "upload_max_retries", fallback=3),
-            "upload_backoff_factor": config.getfloat("ONEDRIVE", "upload_backoff_factor", fallback=1.5),
-            "upload_retry_status": config.get("ONEDRIVE", "upload_retry_status", fallback="429,500,502,503,504"),
-        },
-        "omie_api": {
-            "app_key": config.get("omie_api", "app_key"),
-            "app_secret": config.get("omie_api", "app_secret"),
-            "base_url_nf": config.get("omie_api", "base_url_nf"),
-            "base_url_xml": config.get("omie_api", "base_url_xml"),
-            "calls_per_second": config.getint("omie_api", "calls_per_second", fallback=4),
-        },
-        "query_params": {
-            "start_date": config.get("query_params", "start_date"),
-            "end_date": config.get("query_params", "end_date"),
-            "records_per_page": config.getint("query_params", "records_per_page", fallback=200),
-        },
-        "pipeline": {
-            "modo_hibrido_ativo": config.getboolean("pipeline", "modo_hibrido_ativo", fallback=True),
-            "min_erros_para_reprocessamento": config.getint("pipeline", "min_erros_para_reprocessamento", fallback=30000),
-            "reprocessar_automaticamente": config.getboolean("pipeline", "reprocessar_automaticamente", fallback=True),
-            "apenas_normal": config.getboolean("pipeline", "apenas_normal", fallback=False),
-        },
-        "logging": {
-            "log_level": config.get("logging", "log_level", fallback="INFO"),
-            "log_file": config.get("logging", "log_file", fallback="extrator.log"),
-        }
-    }
+    if padrao:
+        _RESOLVED_CONFIG_PATH = config_file
 
-def log_configuracoes(config: dict, logger) -> None:
-    for secao, valores in config.items():
-        logger.info(f"[MAIN.CONFIG] Seção: {secao}")
-        for chave, valor in valores.items():
-            logger.info(f"    {chave}: {valor}")
+    with fh:
+        st = os.fstat(fh.fileno())
+        chave_cache = (os.path.abspath(config_file), st.st_mtime_ns, st.st_size)
+        resultado = _CONFIG_CACHE.get(chave_cache)
+        if resultado is not None:
+            if padrao:
+                _LAST_STAT_TIME, _LAST_RESULT = time.monotonic(), resultado
+            return resultado
+        
+        raw = _ini_bruto_do_arquivo(fh, chave_cache)
+    
+    resultado = _ler_configuracoes(raw)
+    
+    if len(_CONFIG_CACHE) >= _CONFIG_CACHE_MAX:
+        _CONFIG_CACHE.pop(next(iter(_CONFIG_CACHE)))
+    _CONFIG_CACHE[chave_cache] = resultado
+    if padrao:
+        _LAST_STAT_TIME, _LAST_RESULT = time.monotonic(), resultado
+    return resultado
+
+def _ini_bruto_do_arquivo(fh, chave_cache: Tuple[str, int, int]) -> MappingProxyType:
+    """Devolve o INI bruto do arquivo aberto, lendo-o apenas se a versão não estiver em cache."""
+    raw = _PARSER_CACHE.get(chave_cache)
+    if raw is None:
+        # Lê os bytes uma vez e decodifica em memória (utf-8-sig tolera BOM do Bloco de Notas);
+        # o ConfigParser mantém as regras de sempre (seções duplicadas, continuação,
+        # comentários, interpolação) e o cache evita reinterpretar a mesma versão
+        parser = configparser.ConfigParser()
+        parser.read_string(fh.read().decode('utf-8-sig'), source=chave_cache[0])
+        raw = MappingProxyType({
+            nome: MappingProxyType(dict(parser.items(nome)))
+            for nome in parser.sections()
+        })
+        if len(_PARSER_CACHE) >= _CONFIG_CACHE_MAX:
+            _PARSER_CACHE.pop(next(iter(_PARSER_CACHE)))
+        _PARSER_CACHE[chave_cache] = raw
+    return raw
+
+def _carregar_ini_bruto(caminho: str) -> MappingProxyType:
+    """
+    Acesso somente leitura às seções cruas de um INI (valores como texto).
+    
+    Compartilha o cache com carregar_configuracoes: a mesma versão do
+    arquivo (mtime/tamanho) é interpretada uma única vez.
+    """
+    with open(caminho, 'rb') as fh:
+        st = os.fstat(fh.fileno())
+        return _ini_bruto_do_arquivo(fh, (os.path.abspath(caminho), st.st_mtime_ns, st.st_size))
+
+def _limpar_cache_configuracoes() -> None:
+    """Descarta os caches por mtime e o atalho da janela de TTL."""
+    global _LAST_RESULT
+    _CONFIG_CACHE.clear()
+    _PARSER_CACHE.clear()
+    _caminhos.cache_clear()
+    _LAST_RESULT = None
+
+carregar_configuracoes.cache_clear = _limpar_cache_configuracoes
+
+# Conversores de valores brutos do INI (dicionário da seção, chave, fallback)
+_BOOL_VERDADEIROS = frozenset(('1', 'true', 'yes', 'on'))
+_BOOL_FALSOS = frozenset(('0', 'false', 'no', 'off'))
+
+def _cfg_str(d: Mapping[str, str], k: str, f: str) -> str:
+    v = d.get(k)
+    return v if v is not None else f
+
+def _cfg_int(d: Mapping[str, str], k: str, f: int) -> int:
+    v = d.get(k)
+    return int(v) if v is not None else f
+
+def _cfg_float(d: Mapping[str, str], k: str, f: float) -> float:
+    v = d.get(k)
+    return float(v) if v is not None else f
+
+def _cfg_bool(d: Mapping[str, str], k: str, f: bool) -> bool:
+    v = d.get(k)
+    if v is None:
+        return f
+    v = v.strip().lower()
+    if v in _BOOL_VERDADEIROS:
+        return True
+    if v in _BOOL_FALSOS:
+        return False
+    # Mesmo comportamento do ConfigParser.getboolean para valores não reconhecidos
+    raise ValueError(f"Not a boolean: {d[k]}")
+
+def _cfg_int_tuple(d: Mapping[str, str], k: str, f: str) -> Tuple[int, ...]:
+    v = d.get(k)
+    return tuple(int(x) for x in (v if v is not None else f).split(","))
+
+def _cfg_obrigatorio(raw: Mapping[str, Mapping[str, str]], secao: str, chave: str) -> str:
+    v = raw.get(secao, {}).get(chave)
+    if v is None:
+        if secao not in raw:
+            raise configparser.NoSectionError(secao)
+        raise configparser.NoOptionError(chave, secao)
+    # Valores obrigatórios (credenciais, URLs, datas) são internados uma única vez
+    return sys.intern(v)
+
+# Esquema das configurações: seção -> chave -> (tipo, padrão). "obrigatorio" não
+# tem padrão e falha com NoSectionError/NoOptionError se faltar no INI
+_CONFIG_SCHEMA: Dict[str, Dict[str, Tuple[str, Any]]] = {
+    "paths": {
+        "resultado_dir": ("str", "resultado"),
+        "db_name": ("str", "omie.db"),
+        "log_dir": ("str", "log"),
+        "temp_dir": ("str", "temp"),
+    },
+    "compactador": {
+        "arquivos_por_pasta": ("int", 10000),
+        "max_workers": ("int", 4),
+        "batch_size": ("int", 1000),
+    },
+    "ONEDRIVE": {
+        "upload_onedrive": ("bool", False),
+        "pasta_destino": ("str", "Documentos Compartilhados"),
+        "upload_max_retries": ("int", 3),
+        "upload_backoff_factor": ("float", 1.5),
+        # Já convertido para inteiros: retentativas comparam com `status in retry_status`
+        "upload_retry_status": ("int_tuple", "429,500,502,503,504"),
+    },
+    "omie_api": {
+        "app_key": ("obrigatorio", None),
+        "app_secret": ("obrigatorio", None),
+        "base_url_nf": ("obrigatorio", None),
+        "base_url_xml": ("obrigatorio", None),
+        "calls_per_second": ("int", 4),
+    },
+    "query_params": {
+        "start_date": ("obrigatorio", None),
+        "end_date": ("obrigatorio", None),
+        "records_per_page": ("int", 200),
+    },
+    "pipeline": {
+        "modo_hibrido_ativo": ("bool", True),
+        "min_erros_para_reprocessamento": ("int", 30000),
+        "reprocessar_automaticamente": ("bool", True),
+        "apenas_normal": ("bool", False),
+    },
+    "logging": {
+        "log_level": ("str", "INFO"),
+        "log_file": ("str", "extrator.log"),
+    },
+}
+
+_CONVERSORES_CFG = {
+    "str": _cfg_str,
+    "int": _cfg_int,
+    "float": _cfg_float,
+    "bool": _cfg_bool,
+    "int_tuple": _cfg_int_tuple,
+}
+
+_SECAO_VAZIA: Mapping[str, str] = MappingProxyType({})
+
+# Seções sem uso quando pipeline.apenas_normal está ativo (não são convertidas)
+_SECOES_IGNORADAS_APENAS_NORMAL = frozenset(("compactador", "ONEDRIVE"))
+
+def _ler_configuracoes(raw: Mapping[str, Mapping[str, str]]) -> Config:
+    """
+    Converte as seções cruas do INI para os tipos esperados, seguindo _CONFIG_SCHEMA.
+    
+    Com pipeline.apenas_normal ativo, compactador e ONEDRIVE saem vazias.
+    """
+    apenas_normal = _cfg_bool(raw.get("pipeline", _SECAO_VAZIA), "apenas_normal", False)
+    secoes = {}
+    for secao, campos in _CONFIG_SCHEMA.items():
+        if apenas_normal and secao in _SECOES_IGNORADAS_APENAS_NORMAL:
+            secoes[secao] = _SECAO_VAZIA
+            continue
+        d = raw.get(secao, _SECAO_VAZIA)
+        secoes[secao] = MappingProxyType({
+            chave: (
+                _cfg_obrigatorio(raw, secao, chave) if tipo == "obrigatorio"
+                else _CONVERSORES_CFG[tipo](d, chave, padrao)
+            )
+            for chave, (tipo, padrao) in campos.items()
+        })
+    return MappingProxyType(secoes)
+
+# Chaves cujo valor nunca vai para o log
+_CHAVES_SENSIVEIS = frozenset(("app_key", "app_secret"))
+
+def log_configuracoes(config: Mapping[str, Any], logger) -> None:
+    # Nada é formatado se INFO estiver desligado
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    # Um único registro com todas as chaves (um lock/flush de handler em vez de um por seção)
+    logger.info("%s", "\n".join(
+        f"[MAIN.CONFIG] {secao}.{chave} = {'***' if chave in _CHAVES_SENSIVEIS else valor}"
+        for secao, valores in config.items()
+        for chave, valor in valores.items()
+    ))
 # =============================================================================
 # Funcões de execucao das etapas do pipeline
 # =============================================================================
 
+def _ler_periodo_consulta() -> Optional[Tuple[str, str]]:
+    """
+    Lê (start_date, end_date) de [query_params] pelo cache do INI bruto.
+    
+    O arquivo só é interpretado de novo se tiver mudado; retorna None se a
+    seção não existir.
+    """
+    query_params = _carregar_ini_bruto(CONFIG_PATH).get('query_params')
+    if query_params is None:
+        return None
+    return query_params.get('start_date', 'N/A'), query_params.get('end_date', 'N/A')
+
 def executar_atualizador_datas_query() -> None:
     """
     Atualiza as datas de consulta no arquivo de configuracoo INI.
@@ -382,41 +736,32 @@ def executar_atualizador_datas_query() -> None:
     """
     try:
         logger.info("[PIPELINE.DATAS] Iniciando atualizacao das datas de consulta")
-        t0 = time.time()
+        cronometro = _Cronometro()
         
-        # Import local para evitar dependência circular
-        from src import atualizar_query_params_ini
+        atualizar_query_params_ini = _modulo_local("src.atualizar_query_params_ini")
         
         # Log de contexto antes da atualização
         try:
-            import configparser
-            config = configparser.ConfigParser()
-            config.read("configuracao.ini", encoding='utf-8')
-            if config.has_section('query_params'):
-                data_atual_inicio = config.get('query_params', 'start_date', fallback='N/A')
-                data_atual_fim = config.get('query_params', 'end_date', fallback='N/A')
-                logger.info(f"[PIPELINE.DATAS.CONTEXTO] Periodo atual: {data_atual_inicio} a {data_atual_fim}")
+            periodo = _ler_periodo_consulta()
+            if periodo:
+                logger.info(f"[PIPELINE.DATAS.CONTEXTO] Periodo atual: {periodo[0]} a {periodo[1]}")
         except Exception as ctx_error:
             logger.debug(f"[PIPELINE.DATAS.CONTEXTO] Erro ao ler configuracao atual: {ctx_error}")
         
         logger.info("[PIPELINE.DATAS.INICIO] Calculando novo periodo")
         atualizar_query_params_ini.atualizar_datas_configuracao_ini()
+        # O INI acabou de ser reescrito: descarta os caches para não depender só de mtime/tamanho
+        carregar_configuracoes.cache_clear()
         
         # Log das novas datas
         try:
-            import configparser
-            config = configparser.ConfigParser()
-            config.read("configuracao.ini", encoding='utf-8')
-            if config.has_section('query_params'):
-                nova_data_inicio = config.get('query_params', 'start_date', fallback='N/A')
-                nova_data_fim = config.get('query_params', 'end_date', fallback='N/A')
-                logger.info(f"[PIPELINE.DATAS.RESULTADO] Novo periodo: {nova_data_inicio} a {nova_data_fim}")
+            periodo = _ler_periodo_consulta()
+            if periodo:
+                logger.info(f"[PIPELINE.DATAS.RESULTADO] Novo periodo: {periodo[0]} a {periodo[1]}")
         except Exception as new_error:
             logger.debug(f"[PIPELINE.DATAS.RESULTADO] Erro ao ler novas configuracoes: {new_error}")
         
-        t1 = time.time()
-        duracao = t1 - t0
-        logger.info(f"[PIPELINE.DATAS.SUCESSO] Atualizacao de datas finalizada - Tempo total: {formatar_tempo_total(duracao)} ({duracao:.2f}s)")
+        logger.info(f"[PIPELINE.DATAS.SUCESSO] Atualizacao de datas finalizada - Tempo total: {cronometro}")
         
     except Exception as e:
         logger.exception(f"[PIPELINE.DATAS.ERRO] Erro durante atualizacao de datas: {e}")
@@ -455,44 +800,29 @@ def executar_atualizacao_caminhos() -> None:
     """
     try:
         logger.info("[CAMINHOS] Iniciando atualizacao de caminhos no banco...")
-        t0 = time.time()
+        cronometro = _Cronometro()
         
         # Verificação prévia: há arquivos para processar?
-        config = carregar_configuracoes()
-        resolver = inicializar_path_resolver()
-        resultado_dir = resolver.get_path_by_key("resultado_dir")
+        resultado_dir = _caminhos().resultado_dir
         
-        # Conta arquivos XML e ZIPs
-        arquivos_xml = list(resultado_dir.rglob("*.xml"))
-        #arquivos_zip = list(resultado_dir.rglob("*.zip"))
-        total_arquivos = len(arquivos_xml)  # + len(arquivos_zip)
-        
-        #total_arquivos = len(arquivos_xml) + len(arquivos_zip)
+        # Conta arquivos XML (sem materializar a lista de caminhos)
+        total_arquivos, = _contar_arquivos_por_sufixo(resultado_dir, (".xml",))
         
         if total_arquivos == 0:
             logger.warning("[CAMINHOS] Nenhum arquivo XML ou ZIP encontrado - pulando atualização")
             return
 
-        logger.info(f"[CAMINHOS] Encontrados {len(arquivos_xml)} XMLs para processar")
+        logger.info(f"[CAMINHOS] Encontrados {total_arquivos} XMLs para processar")
 
-        # Import local para evitar dependência circular
-        from src import atualizar_caminhos_arquivos
-        atualizar_caminhos_arquivos.atualizar_caminhos_no_banco()
+        _modulo_local("src.atualizar_caminhos_arquivos").atualizar_caminhos_no_banco()
         
-        t1 = time.time()
-        duracao = t1 - t0
-        logger.info(f"[CAMINHOS] atualizacao finalizada com sucesso. Tempo total: {formatar_tempo_total(duracao)} ({duracao:.2f}s)")
+        logger.info(f"[CAMINHOS] atualizacao finalizada com sucesso. Tempo total: {cronometro}")
         
         # Validação pós-atualização: estatísticas
         try:
-            import sqlite3
-            db_path = resolver.get_path_by_key("db_name")
-            with sqlite3.connect(str(db_path)) as conn:
-                cursor = conn.execute("SELECT COUNT(*) as total FROM notas WHERE xml_baixado = 1")
-                total_baixados = cursor.fetchone()[0]
-                
-                cursor = conn.execute("SELECT COUNT(*) as total FROM notas WHERE xml_vazio = 1")
-                total_vazios = cursor.fetchone()[0]
+            db_path = _caminhos().db_path
+            with conexao_otimizada(str(db_path)) as conn:
+                total_baixados, _, total_vazios = conn.execute(SQL_CONTAGEM_FLAGS_XML).fetchone()
                 
                 logger.info(f"[CAMINHOS] Estatísticas pós-atualização:")
                 logger.info(f"  • Arquivos marcados como baixados: {total_baixados:,}")
@@ -538,19 +868,13 @@ def executar_atualizacao_anomesdia() -> None:
     """
     try:
         logger.info("[PIPELINE.ANOMESDIA] Iniciando atualização do campo anomesdia ...")
-        t0 = time.time()
-        
-        # Importa função do módulo utils
-        from src.utils import atualizar_anomesdia
+        cronometro = _Cronometro()
         
         # Executa atualização com logging detalhado
         logger.info("[PIPELINE.ANOMESDIA] Processando registros sem campo anomesdia...")
-        resolver = inicializar_path_resolver()
-        db_path = str(resolver.get_path_by_key("db_name"))
+        db_path = str(_caminhos().db_path)
         registros_atualizados = atualizar_anomesdia(db_path=db_path)
-        
-        t1 = time.time()
-        duracao = t1 - t0
+        duracao = cronometro.segundos
         
         # Log de resultados
         if registros_atualizados > 0:
@@ -566,6 +890,23 @@ def executar_atualizacao_anomesdia() -> None:
         logger.warning("[PIPELINE.ANOMESDIA.CONTINUACAO] Pipeline continuará sem indexação temporal completa")
 
 
+def _executar_coroutine(coro) -> Any:
+    """
+    Executa a coroutine até o fim, usando uvloop quando estiver instalado.
+    
+    No Python 3.11+ usa asyncio.Runner com a fábrica de loops do uvloop, sem
+    alterar a policy global; nas versões anteriores instala a policy do uvloop.
+    Sem uvloop, equivale a asyncio.run().
+    """
+    if not UVLOOP_DISPONIVEL:
+        return asyncio.run(coro)
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(coro)
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(coro)
+
+
 def _executar_async_com_config(config: Dict[str, Any]) -> None:
     """
     Executa extrator assíncrono com configurações específicas.
@@ -574,9 +915,9 @@ def _executar_async_com_config(config: Dict[str, Any]) -> None:
         config: Configurações personalizadas
     """
     try:
-        # Import local para evitar dependência circular
-        from src.extrator_async import baixar_xmls, listar_nfs
-        from src.omie_client_async import OmieClient, carregar_configuracoes_client
+        omie_client_async = _modulo_local("src.omie_client_async")
+        OmieClient = omie_client_async.OmieClient
+        carregar_configuracoes_client = omie_client_async.carregar_configuracoes_client
         
         # CORREÇÃO: Não sobrescrever a config passada como parâmetro
         # Usar config completa do omie_client_async mas manter parâmetros customizados
@@ -593,8 +934,9 @@ def _executar_async_com_config(config: Dict[str, Any]) -> None:
         if not app_key or not app_secret:
             raise ValueError("app_key e app_secret são obrigatórios no arquivo de configuração")
             
-        for v, k in config_merged.items():
-            logger.info(f"[ASYNC.CONFIG] Configurações carregadas com sucesso {v}: {k}")
+        # Só os nomes das chaves (nunca valores: app_key/app_secret não vão para o log)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[ASYNC.CONFIG] %d chaves carregadas: %s", len(config_merged), sorted(config_merged))
 
         # CORREÇÃO: Criar cliente com TODAS as configurações necessárias
         client = OmieClient(
@@ -606,59 +948,61 @@ def _executar_async_com_config(config: Dict[str, Any]) -> None:
         )
         
         # Executar pipeline assíncrono
-        import asyncio
-        
         # CORREÇÃO: Usar abordagem mais simples e direta
         logger.info("[ASYNC.CONFIG] Iniciando pipeline assíncrono...")
-        asyncio.run(_pipeline_async_completo(client, config_merged))
+        _executar_coroutine(_pipeline_async_completo(client, config_merged))
         
     except Exception as e:
-        logger.exception(f"[ASYNC.CONFIG] Erro durante execução async: {e}")
+        logger.exception("[ASYNC.CONFIG] Erro durante execução async: %s", e)
         raise
 
 
 async def _pipeline_async_completo(client, config: Dict[str, Any]) -> None:
     """Pipeline assíncrono completo."""
-    from src.extrator_async import baixar_xmls, listar_nfs
-    from src.utils import iniciar_db
+    extrator_async = _modulo_local("src.extrator_async")
+    baixar_xmls, listar_nfs = extrator_async.baixar_xmls, extrator_async.listar_nfs
     
-    resolver = inicializar_path_resolver()
     # CORREÇÃO: Usar path relativo para manter compatibilidade
     db_name_relativo = config.get("db_name", "omie.db")
     db_name = str(Path.cwd() / db_name_relativo)  # Forçar usar diretório atual
     
     # DEBUG: Comparar com o que o extrator_async standalone faria
     db_name_fallback = config.get("db_name", "omie.db")
-    logger.info(f"[PIPELINE.ASYNC.DEBUG] db_name corrigido: {db_name}")
-    logger.info(f"[PIPELINE.ASYNC.DEBUG] db_name via config (como standalone): {db_name_fallback}")
-    logger.info(f"[PIPELINE.ASYNC.DEBUG] Current working directory: {Path.cwd()}")
+    logger.info("[PIPELINE.ASYNC.DEBUG] db_name corrigido: %s", db_name)
+    logger.info("[PIPELINE.ASYNC.DEBUG] db_name via config (como standalone): %s", db_name_fallback)
+    logger.info("[PIPELINE.ASYNC.DEBUG] Current working directory: %s", Path.cwd())
     
-    t1 = time.time()
+    cronometro = _Cronometro()
     logger.info("[PIPELINE.ASYNC] Iniciando pipeline assíncrono completo")
     logger.info(f"[PIPELINE.ASYNC] iniciando iniciar banco de dados: {db_name}")
 
     # Inicializar banco
     # CORREÇÃO: Usar TABLE_NAME como no extrator_async standalone
-    from src.extrator_async import TABLE_NAME
-    iniciar_db(db_name, TABLE_NAME)
-    t2 = time.time()
-    logger.info(f"[PIPELINE.ASYNC] Banco de dados inicializado em {formatar_tempo_total(t2 - t1)} ({t2 - t1:.2f}s)")
+    TABLE_NAME = extrator_async.TABLE_NAME
+    # Inicialização síncrona do SQLite fora da thread do event loop
+    await asyncio.to_thread(iniciar_db, db_name, TABLE_NAME)
+    logger.info(f"[PIPELINE.ASYNC] Banco de dados inicializado em {cronometro}")
     logger.info("[PIPELINE.ASYNC] Iniciando listagem e download de notas fiscais assíncronos")
-    t3 = time.time()
+    cronometro = _Cronometro()
     # Lista as notas fiscais da API Omie e salva no banco de dados
-    logger.info(f"[PIPELINE.ASYNC.DEBUG] Iniciando listar_nfs com config: start_date={config.get('start_date')}, end_date={config.get('end_date')}")
-    logger.info(f"[PIPELINE.ASYNC.DEBUG] Client configurado: app_key={client.app_key[:10]}..., calls_per_second={client.calls_per_second}")
+    logger.info(
+        "[PIPELINE.ASYNC.DEBUG] Iniciando listar_nfs com config: start_date=%s, end_date=%s",
+        config.get('start_date'), config.get('end_date')
+    )
+    logger.info(
+        "[PIPELINE.ASYNC.DEBUG] Client configurado: app_key=%s..., calls_per_second=%s",
+        client.app_key[:10], client.calls_per_second
+    )
     logger.info("[PIPELINE.ASYNC.DEBUG] Antes de chamar listar_nfs...")
     
     try:
         await listar_nfs(client, config, db_name)
         logger.info("[PIPELINE.ASYNC.DEBUG] listar_nfs completou com sucesso!")
     except Exception as e:
-        logger.exception(f"[PIPELINE.ASYNC.DEBUG] Erro em listar_nfs: {e}")
+        logger.exception("[PIPELINE.ASYNC.DEBUG] Erro em listar_nfs: %s", e)
         raise
         
-    t4 = time.time()
-    logger.info(f"[PIPELINE.ASYNC] Listagem concluída em {formatar_tempo_total(t4 - t3)} ({t4 - t3:.2f}s)")
+    logger.info(f"[PIPELINE.ASYNC] Listagem concluída em {cronometro}")
     
     
     # =============================================================================
@@ -667,8 +1011,8 @@ async def _pipeline_async_completo(client, config: Dict[str, Any]) -> None:
     logger.info("[FASE 3.5] - Atualizando indexação temporal (anomesdia)...")
     try:
         logger.info("[PIPELINE.ASYNC] Iniciando indexação temporal - ANOMESDIA EM TODOS CAMPOS")
-        # Vai popular o campo anomesdia
-        executar_atualizacao_anomesdia()
+        # Vai popular o campo anomesdia (SQLite síncrono em thread, sem travar o loop)
+        await asyncio.to_thread(executar_atualizacao_anomesdia)
         logger.info("[PIPELINE.ASYNC] Indexação temporal concluída com sucesso")
         logger.info("[FASE 3.5] - ✓ Indexação temporal concluída com sucesso")
     except Exception as e:
@@ -678,10 +1022,11 @@ async def _pipeline_async_completo(client, config: Dict[str, Any]) -> None:
 
     # Executar download com configurações otimizadas
     logger.info("[ASYNC.PIPELINE] Iniciando download assíncrono")
-    t5 = time.time()
-    await baixar_xmls(client, db_name)
-    t6 = time.time()
-    logger.info(f"[ASYNC.PIPELINE] Download concluído em {formatar_tempo_total(t6 - t5)} ({t6 - t5:.2f}s)")
+    cronometro = _Cronometro()
+    # Gravação dos XMLs em pool próprio (uma ida à thread por arquivo)
+    with extrator_async.EscritorXml() as escritor:
+        await baixar_xmls(client, db_name, escritor=escritor)
+    logger.info(f"[ASYNC.PIPELINE] Download concluído em {cronometro}")
 
 
 def executar_compactador_resultado() -> None:
@@ -709,27 +1054,23 @@ def executar_compactador_resultado() -> None:
     """
     try:
         logger.info("[PIPELINE.COMPACTADOR] Iniciando compactacoo dos resultados")
-        t0 = time.time()
+        cronometro = _Cronometro()
         
-        # Import local para evitar dependência circular
-        from src import compactador_resultado
+        compactador_resultado = _modulo_local("src.compactador_resultado")
         
         # Log de início com informações contextuais
         logger.info("[PIPELINE.COMPACTADOR.INICIO] Verificando arquivos para compactacao")
         
         compactador_resultado.compactar_resultados()
         
-        t1 = time.time()
-        duracao = t1 - t0
-        logger.info(f"[PIPELINE.COMPACTADOR.SUCESSO] Compactacao finalizada - Tempo total: {formatar_tempo_total(duracao)} ({duracao:.2f}s)")
+        logger.info(f"[PIPELINE.COMPACTADOR.SUCESSO] Compactacao finalizada - Tempo total: {cronometro}")
         
         # Adicionar métricas se disponível
         try:
-            resolver = inicializar_path_resolver()
-            resultado_dir = resolver.get_path_by_key("resultado_dir")
+            resultado_dir = _caminhos().resultado_dir
             if resultado_dir.exists():
-                total_arquivos = len(list(resultado_dir.rglob("*.xml")))
-                total_zips = len(list(resultado_dir.rglob("*.zip")))
+                # XMLs e ZIPs contados na mesma varredura
+                total_arquivos, total_zips = _contar_arquivos_por_sufixo(resultado_dir, (".xml", ".zip"))
                 logger.info(f"[PIPELINE.COMPACTADOR.METRICAS] {total_arquivos} XMLs, {total_zips} ZIPs criados")
         except Exception as metric_error:
             logger.debug(f"[PIPELINE.COMPACTADOR.METRICAS] Erro ao coletar métricas: {metric_error}")
@@ -766,11 +1107,10 @@ def executar_upload_resultado_onedrive() -> None:
     try:
         logger.info("[PIPELINE.ONEDRIVE] Iniciando upload em lote dos resultados")
         
-        # Import local para evitar dependência circular
-        from src.upload_onedrive import fazer_upload_lote
+        fazer_upload_lote = _modulo_local("src.upload_onedrive").fazer_upload_lote
         logger.info("[PIPELINE.UPLOAD] Usando sistema legado de upload")
         
-        t0 = time.time()
+        cronometro = _Cronometro()
         
         # Busca por arquivos ZIP na pasta resultado
         resultado_dir = Path("resultado")
@@ -778,23 +1118,28 @@ def executar_upload_resultado_onedrive() -> None:
             logger.warning("[PIPELINE.ONEDRIVE.VERIFICACAO] Pasta resultado nao encontrada")
             return
         
-        # Lista todos os arquivos .zip
-        arquivos_zip = list(resultado_dir.rglob("*.zip"))
-        
-        if not arquivos_zip:
+        # Uma única varredura: o primeiro ZIP decide a saída antecipada e o
+        # restante preenche caminhos e tamanhos (listas paralelas) ao mesmo tempo
+        zips = _iterar_arquivos_com_stat(resultado_dir, ".zip")
+        primeiro = next(zips, None)
+        if primeiro is None:
             logger.info("[PIPELINE.ONEDRIVE.VERIFICACAO] Nenhum arquivo ZIP encontrado para upload")
             return
         
+        arquivos_zip = [primeiro[0]]
+        tamanhos = [primeiro[1].st_size]
+        for arquivo, st in zips:
+            arquivos_zip.append(arquivo)
+            tamanhos.append(st.st_size)
+        tamanho_total = sum(tamanhos)
+        
+        # Maiores primeiro: os uploads longos começam cedo e não ficam para o fim do lote
+        ordem = sorted(range(len(arquivos_zip)), key=tamanhos.__getitem__, reverse=True)
+        arquivos_zip = [arquivos_zip[i] for i in ordem]
+        
         total = len(arquivos_zip)
         logger.info(f"[PIPELINE.ONEDRIVE.INICIO] Encontrados {total} arquivos ZIP para upload")
-        
-        # Calcular tamanho total aproximado
-        try:
-            tamanho_total = sum(arquivo.stat().st_size for arquivo in arquivos_zip)
-            tamanho_mb = tamanho_total / (1024 * 1024)
-            logger.info(f"[PIPELINE.ONEDRIVE.METRICAS] Tamanho total: {tamanho_mb:.1f} MB")
-        except Exception as size_error:
-            logger.debug(f"[PIPELINE.ONEDRIVE.METRICAS] Erro ao calcular tamanho: {size_error}")
+        logger.info(f"[PIPELINE.ONEDRIVE.METRICAS] Tamanho total: {tamanho_total / (1024 * 1024):.1f} MB")
         
         # Executa upload em lote
         resultados = fazer_upload_lote(arquivos_zip, "XML_Compactados")
@@ -804,8 +1149,7 @@ def executar_upload_resultado_onedrive() -> None:
         falhas = total - sucessos
         taxa_sucesso = (sucessos / total * 100) if total > 0 else 0
         
-        t1 = time.time()
-        duracao = t1 - t0
+        duracao = cronometro.segundos
         velocidade = sucessos / (duracao / 60) if duracao > 0 else 0
         
         logger.info(f"[PIPELINE.ONEDRIVE.SUCESSO] Upload finalizado: {sucessos}/{total} arquivos ({taxa_sucesso:.1f}%)")
@@ -817,6 +1161,26 @@ def executar_upload_resultado_onedrive() -> None:
         logger.exception(f"[PIPELINE.ONEDRIVE.ERRO] Erro critico durante upload: {e}")
         logger.error("[PIPELINE.ONEDRIVE.CONTINUACAO] Pipeline continuara sem upload")
 
+def criar_indices_performance(db_path: str) -> int:
+    """
+    Garante os índices de INDICES_VERIFICACAO no banco.
+    
+    Só cria os que faltam e, nesse caso, roda ANALYZE notas para que o
+    planejador passe a considerá-los; sem índices novos não há ANALYZE
+    (evita varrer a tabela a cada execução).
+    
+    Returns:
+        int: Quantidade de índices criados
+    """
+    with conexao_otimizada(db_path) as conn:
+        existentes = {
+            row[0] for row in conn.execute("SELECT name FROM pragma_index_list('notas')")
+        }
+        faltantes = [sql for nome, sql in INDICES_VERIFICACAO.items() if nome not in existentes]
+        if faltantes:
+            conn.executescript(";".join(faltantes) + ";ANALYZE notas;")
+        return len(faltantes)
+
 def executar_verificador_xmls() -> None:
     """
     Executa verificacao de integridade dos arquivos XML baixados.
@@ -850,105 +1214,86 @@ def executar_verificador_xmls() -> None:
     """
     try:
         logger.info("[PIPELINE.VERIFICADOR] Iniciando verificacao de integridade dos XMLs")
-        t0 = time.time()
+        cronometro = _Cronometro()
         
         # 0. CACHE: Limpar cache para execução limpa e obter estatísticas iniciais
         logger.info("[PIPELINE.VERIFICADOR.CACHE] Preparando sistema de cache...")
         try:
-            # Obtém estatísticas antes da limpeza
-            stats_iniciais = obter_estatisticas_cache()
-            if stats_iniciais['directories_cached'] > 0:
-                logger.info(f"[PIPELINE.VERIFICADOR.CACHE] Cache existente: {stats_iniciais['directories_cached']} dirs, {stats_iniciais['total_files_cached']} arquivos")
+            # Estatísticas antes da limpeza (só coletadas se o INFO for emitido)
+            if logger.isEnabledFor(logging.INFO):
+                stats_iniciais = obter_estatisticas_cache()
+                if stats_iniciais['directories_cached'] > 0:
+                    logger.info(
+                        "[PIPELINE.VERIFICADOR.CACHE] Cache existente: %s dirs, %s arquivos",
+                        stats_iniciais['directories_cached'], stats_iniciais['total_files_cached']
+                    )
             
             # Limpa cache para execução limpa (opcional, baseado em configuração)
             cache_limpo = limpar_cache_indexacao_xmls()
             if cache_limpo > 0:
-                logger.info(f"[PIPELINE.VERIFICADOR.CACHE] Cache limpo: {cache_limpo} entradas removidas")
+                logger.info("[PIPELINE.VERIFICADOR.CACHE] Cache limpo: %d entradas removidas", cache_limpo)
             else:
                 logger.info("[PIPELINE.VERIFICADOR.CACHE] Cache já estava limpo")
                 
         except Exception as cache_error:
-            logger.warning(f"[PIPELINE.VERIFICADOR.CACHE] Erro no gerenciamento de cache: {cache_error}")
+            logger.warning("[PIPELINE.VERIFICADOR.CACHE] Erro no gerenciamento de cache: %s", cache_error)
         
         # 1. OTIMIZAÇÃO: Criar índices de performance ANTES da verificação
         logger.info("[PIPELINE.VERIFICADOR.INDICES] Criando índices de performance para verificação")
         try:
-            #criar_indices_performance("omie.db")
-            logger.info("[PIPELINE.VERIFICADOR.INDICES] ✓ Índices criados/verificados com sucesso")
+            criados = criar_indices_performance(str(_caminhos().db_path))
+            logger.info(f"[PIPELINE.VERIFICADOR.INDICES] ✓ Índices criados/verificados com sucesso ({criados} novos)")
         except Exception as idx_error:
             logger.warning(f"[PIPELINE.VERIFICADOR.INDICES] Erro ao criar índices: {idx_error}")
         
-        # 2. Log de contexto antes da verificação (usando índice otimizado)
-        try:
-            resolver = inicializar_path_resolver()
-            db_path = str(resolver.get_path_by_key("db_name"))
-            with conexao_otimizada(db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Usa o índice idx_status_download para consulta rápida
-                cursor.execute("SELECT COUNT(*) FROM notas WHERE xml_baixado = 1")
-                total_baixados = cursor.fetchone()[0]
-                
-                cursor.execute("SELECT COUNT(*) FROM notas WHERE xml_baixado = 0")
-                total_pendentes = cursor.fetchone()[0]
-                
-                logger.info(f"[PIPELINE.VERIFICADOR.CONTEXTO] {total_baixados:,} XMLs marcados como baixados")
-                logger.info(f"[PIPELINE.VERIFICADOR.CONTEXTO] {total_pendentes:,} XMLs pendentes para verificacao")
-                
-                # Log adicional de performance
-                if total_pendentes > 0:
-                    logger.info(f"[PIPELINE.VERIFICADOR.PERFORMANCE] Verificacao otimizada com índices para {total_pendentes:,} registros")
-                
-        except Exception as ctx_error:
-            logger.debug(f"[PIPELINE.VERIFICADOR.CONTEXTO] Erro ao obter contexto: {ctx_error}")
-        
-        # 3. Import local para evitar dependência circular
-        from src import verificador_xmls
+        # 2. Módulo do verificador (importado sob demanda)
+        verificador_xmls = _modulo_local("src.verificador_xmls")
         
-        # 4. Execução do verificador (agora com índices otimizados)
+        # 3. Execução do verificador (agora com índices otimizados)
         logger.info("[PIPELINE.VERIFICADOR.INICIO] Executando verificacao detalhada com índices otimizados")
-        verificador_xmls.verificar()
+        metricas = verificador_xmls.verificar()
         
-        t1 = time.time()
-        duracao = t1 - t0
+        # 4. Contexto da verificação: contagens feitas pelo próprio verificador na leitura das notas
+        total_pendentes = metricas["pendentes_iniciais"]
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"[PIPELINE.VERIFICADOR.CONTEXTO] {metricas['verificados'] - total_pendentes:,} XMLs marcados como baixados antes da verificacao")
+            logger.info(f"[PIPELINE.VERIFICADOR.CONTEXTO] {total_pendentes:,} XMLs pendentes para verificacao")
+            logger.info(f"[PIPELINE.VERIFICADOR.CONTEXTO] {metricas['encontrados']:,} XMLs válidos encontrados no disco")
+        
+        duracao = cronometro.segundos
         logger.info(f"[PIPELINE.VERIFICADOR.SUCESSO] Verificacao finalizada - Tempo total: {formatar_tempo_total(duracao)} ({duracao:.2f}s)")
         
-        # 5. CACHE: Relatório final de estatísticas de cache
-        try:
-            stats_finais = obter_estatisticas_cache()
-            if stats_finais['directories_cached'] > 0:
-                logger.info("[PIPELINE.VERIFICADOR.CACHE] Estatísticas finais do cache:")
-                logger.info(f"   • Diretórios indexados: {stats_finais['directories_indexed']}")
-                logger.info(f"   • Arquivos em cache: {stats_finais['total_files_cached']}")
-                logger.info(f"   • Cache hits: {stats_finais['cache_hits']}")
-                logger.info(f"   • Cache misses: {stats_finais['cache_misses']}")
-                logger.info(f"   • Hit rate: {stats_finais['hit_rate_percent']:.1f}%")
+        # 5. CACHE: Relatório final de estatísticas de cache (omitido se INFO estiver desligado)
+        if logger.isEnabledFor(logging.INFO):
+            try:
+                stats_finais = obter_estatisticas_cache()
+                if stats_finais['directories_cached'] > 0:
+                    logger.info("[PIPELINE.VERIFICADOR.CACHE] Estatísticas finais do cache:")
+                    logger.info("   • Diretórios indexados: %s", stats_finais['directories_indexed'])
+                    logger.info("   • Arquivos em cache: %s", stats_finais['total_files_cached'])
+                    logger.info("   • Cache hits: %s", stats_finais['cache_hits'])
+                    logger.info("   • Cache misses: %s", stats_finais['cache_misses'])
+                    logger.info("   • Hit rate: %.1f%%", stats_finais['hit_rate_percent'])
                 
-                # Análise de performance do cache
-                if stats_finais['cache_hits'] > 0:
-                    logger.info(f"   ✅ Cache FUNCIONOU - {stats_finais['cache_hits']} acessos otimizados")
-                    performance_gain = "significativo" if stats_finais['hit_rate_percent'] > 50 else "moderado"
-                    logger.info(f"   🚀 Ganho de performance: {performance_gain}")
+                    # Análise de performance do cache
+                    if stats_finais['cache_hits'] > 0:
+                        logger.info("   ✅ Cache FUNCIONOU - %s acessos otimizados", stats_finais['cache_hits'])
+                        performance_gain = "significativo" if stats_finais['hit_rate_percent'] > 50 else "moderado"
+                        logger.info("   🚀 Ganho de performance: %s", performance_gain)
+                    else:
+                        logger.info("   ℹ️  Cache não foi utilizado nesta execução")
                 else:
-                    logger.info("   ℹ️  Cache não foi utilizado nesta execução")
-            else:
-                logger.debug("[PIPELINE.VERIFICADOR.CACHE] Nenhum cache utilizado nesta execução")
+                    logger.debug("[PIPELINE.VERIFICADOR.CACHE] Nenhum cache utilizado nesta execução")
                 
-        except Exception as stats_error:
-            logger.debug(f"[PIPELINE.VERIFICADOR.CACHE] Erro ao obter estatísticas: {stats_error}")
+            except Exception as stats_error:
+                logger.debug("[PIPELINE.VERIFICADOR.CACHE] Erro ao obter estatísticas: %s", stats_error)
         
         # 6. Log de resultados pós-verificação (usando índices)
         try:
-            resolver = inicializar_path_resolver()
-            db_path = str(resolver.get_path_by_key("db_name"))
+            db_path = str(_caminhos().db_path)
             with conexao_otimizada(db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Consultas otimizadas com índices
-                cursor.execute("SELECT COUNT(*) FROM notas WHERE xml_vazio = 1")
-                vazios = cursor.fetchone()[0]
-                cursor.execute("SELECT COUNT(*) FROM notas WHERE xml_baixado = 1")
-                total_baixados_final = cursor.fetchone()[0]
+                # Vazios e baixados em uma única consulta coberta por índice
+                total_baixados_final, _, vazios = conn.execute(SQL_CONTAGEM_FLAGS_XML).fetchone()
                 
                 logger.info(f"[PIPELINE.VERIFICADOR.RESULTADO] XMLs baixados após verificação: {total_baixados_final:,}")
                 
@@ -959,7 +1304,7 @@ def executar_verificador_xmls() -> None:
                     
                 # Calcula velocidade de processamento
                 if duracao > 0:
-                    velocidade = total_pendentes / duracao if 'total_pendentes' in locals() else 0
+                    velocidade = total_pendentes / duracao
                     logger.info(f"[PIPELINE.VERIFICADOR.PERFORMANCE] Velocidade: {velocidade:.1f} XMLs/s")
                     
         except Exception as result_error:
@@ -1003,28 +1348,27 @@ def executar_atualizacao_status_nfe() -> None:
     """
     try:
         logger.info("[MAIN.STATUS_NFE] Iniciando atualização de status das NFe...")
-        t0 = time.time()
+        cronometro = _Cronometro()
         
-        # Import local para evitar dependência circular
-        from src.status_nfe_updater import executar_atualizacao_status_nfe_sync
+        executar_atualizacao_status_nfe_sync = _modulo_local("src.status_nfe_updater").executar_atualizacao_status_nfe_sync
         
         # Executa atualização com limite conservador
         limite_notas = 500  # Limite conservador para não impactar muito a API
         
         logger.info(f"[MAIN.STATUS_NFE] Processando até {limite_notas} notas para atualização de status")
         
-        # Chama função síncrona para integração com pipeline atual
+        # Chama função síncrona para integração com pipeline atual,
+        # repassando as seções já interpretadas (cache por mtime) em vez de reler o INI
         sucesso = executar_atualizacao_status_nfe_sync(
-            config_path="configuracao.ini",
+            config_path=CONFIG_PATH,
             limite_notas=limite_notas,
-            dry_run=False
+            dry_run=False,
+            config=_carregar_ini_bruto(CONFIG_PATH)
         )
         
-        t1 = time.time()
-        
         if sucesso:
             logger.info("[MAIN.STATUS_NFE] ✅ Atualização de status concluída com sucesso")
-            logger.info(f"[MAIN.STATUS_NFE] Tempo de execução: {formatar_tempo_total(t1-t0)} ({t1-t0:.2f}s)")
+            logger.info(f"[MAIN.STATUS_NFE] Tempo de execução: {cronometro}")
         else:
             logger.warning("[MAIN.STATUS_NFE] ⚠️ Atualização concluída com alguns erros")
             logger.warning("[MAIN.STATUS_NFE] Verifique logs detalhados para informações específicas")
@@ -1119,8 +1463,7 @@ def executar_relatorio_arquivos_vazios(pasta: str) -> None:
         logger.info("[PIPELINE.RELATORIO.INICIO] Iniciando analise detalhada")
         
         try:
-            # Import local para evitar dependência circular
-            from src import report_arquivos_vazios
+            report_arquivos_vazios = _modulo_local("src.report_arquivos_vazios")
             
             # Verifica timeout antes de continuar
             if timeout_occurred:
@@ -1264,9 +1607,8 @@ def conexao_otimizada(db_path: str):
         conn = sqlite3.connect(db_path, timeout=30.0)
         conn.row_factory = sqlite3.Row  # Acesso por nome de coluna
         
-        # Aplica PRAGMAs de otimização
-        for pragma, valor in SQLITE_PRAGMAS.items():
-            conn.execute(f"PRAGMA {pragma} = {valor}")
+        # Aplica PRAGMAs de otimização em uma única chamada
+        conn.executescript(_SQL_PRAGMAS_OTIMIZADOS)
         
         yield conn
         
@@ -1312,17 +1654,6 @@ def main() -> None:
         SystemExit: Em caso de falhas críticas que impedem a continuidade
     """
     try:
-        # =============================================================================
-        # Configuração inicial do sistema de logging
-        # =============================================================================
-        # Import local para evitar dependência circular
-        import sqlite3
-        import os
-        import sys
-        import time
-        import logging
-        import configparser
-        
         # =============================================================================
         # Inicialização do sistema de paths portável
         # =============================================================================
@@ -1380,9 +1711,8 @@ def main() -> None:
             # Carregamento das configurações
             config = carregar_configuracoes()
             log_configuracoes(config, logger)
-            resolver = inicializar_path_resolver()
             resultado_dir = config.get('resultado_dir', 'resultado')
-            db_path = str(resolver.get_path_by_key("db_name"))  # Caminho do banco SQLite portável
+            db_path = str(_caminhos().db_path)  # Caminho do banco SQLite portável
             
         except Exception as e:
             logger.exception(f"[FASE 1] Erro ao carregar configurações: {e}")
@@ -1391,8 +1721,7 @@ def main() -> None:
             if not config:
                 config = {'resultado_dir': 'resultado'}
             try:
-                resolver = inicializar_path_resolver()
-                db_path = str(resolver.get_path_by_key("db_name"))
+                db_path = str(_caminhos().db_path)
             except Exception as path_error:
                 logger.error(f"[FASE 1] Erro crítico no PathResolver: {path_error}")
                 sys.exit(1)
@@ -1585,10 +1914,7 @@ def main() -> None:
         logger.info("MÉTRICAS COMPLETAS DO BANCO DE DADOS:")
         try:
             logger.info("[MAIN.METRICAS_COMPLETAS] Iniciando exibição de métricas completas...")
-            # Import local para evitar dependência circular
-            from src.utils import exibir_metricas_completas
-            resolver = inicializar_path_resolver()
-            db_path = str(resolver.get_path_by_key("db_name"))
+            db_path = str(_caminhos().db_path)
             exibir_metricas_completas(db_path)
             logger.info("[MAIN.METRICAS_COMPLETAS] Exibição de métricas completas concluída com sucesso")
         except Exception as e:
@@ -1596,10 +1922,8 @@ def main() -> None:
             
             # Fallback para métricas básicas em caso de erro
             try:
-                import sqlite3
-                resolver = inicializar_path_resolver()
-                db_path = str(resolver.get_path_by_key("db_name"))
-                with sqlite3.connect(db_path) as conn:
+                db_path = str(_caminhos().db_path)
+                with conexao_otimizada(db_path) as conn:
                     cursor = conn.cursor()
                     
                     cursor.execute("SELECT COUNT(*) FROM notas")
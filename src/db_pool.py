@@ -0,0 +1,132 @@
+"""
+CONEXÃO SQLITE COMPARTILHADA - OMIE PIPELINE V3
+Mantém uma conexão de longa duração por banco e por thread, com os PRAGMAs aplicados uma única vez.
+
+Características:
+- Uma conexão por (thread, caminho de banco), reutilizada entre chamadas da mesma thread
+- WAL + synchronous=NORMAL com os PRAGMAs padrão de DatabaseConfig
+- Checkpoint PASSIVE periódico do WAL em thread de fundo, complementando o wal_autocheckpoint
+"""
+
+import atexit
+import logging
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+
+from src.utils import DatabaseConfig
+
+logger = logging.getLogger(__name__)
+
+# Páginas no WAL antes do checkpoint automático do SQLite
+WAL_AUTOCHECKPOINT = 1000
+
+# Intervalo (segundos) do checkpoint PASSIVE em segundo plano
+INTERVALO_CHECKPOINT = 60
+
+_local = threading.local()
+_conexoes: List[Tuple[str, sqlite3.Connection]] = []
+_threads_checkpoint: Dict[str, threading.Thread] = {}
+_eventos_checkpoint: Dict[str, threading.Event] = {}
+_lock = threading.Lock()
+# Incrementada a cada fechar_conexoes(): invalida as conexões em cache de todas as threads
+_geracao = 0
+
+
+def get_conn(db_path: str = "omie.db") -> sqlite3.Connection:
+    """
+    Retorna a conexão da thread atual para o banco, criando-a na primeira chamada.
+
+    Cada thread recebe sua própria conexão: com isolation_level=None uma conexão
+    compartilhada misturaria o BEGIN/COMMIT de threads diferentes. Transações
+    devem ser abertas explicitamente com BEGIN / BEGIN IMMEDIATE.
+
+    Args:
+        db_path: Caminho do banco SQLite
+
+    Returns:
+        sqlite3.Connection: Conexão configurada
+    """
+    if getattr(_local, "geracao", None) != _geracao:
+        _local.geracao = _geracao
+        _local.conexoes = {}
+    conexoes_thread = _local.conexoes
+
+    conn = conexoes_thread.get(db_path)
+    if conn is not None:
+        return conn
+
+    config = DatabaseConfig()
+    # check_same_thread=False apenas para que fechar_conexoes() possa fechá-la no encerramento;
+    # a conexão não deve ser repassada a outras threads
+    conn = sqlite3.connect(
+        db_path,
+        timeout=config.timeout,
+        isolation_level=None,
+        check_same_thread=False
+    )
+    conn.row_factory = sqlite3.Row
+
+    pragmas = dict(config.get_pragmas(), wal_autocheckpoint=WAL_AUTOCHECKPOINT)
+    conn.executescript("".join(f"PRAGMA {p} = {v};" for p, v in pragmas.items()))
+
+    conexoes_thread[db_path] = conn
+    with _lock:
+        _conexoes.append((db_path, conn))
+        if db_path not in _threads_checkpoint:
+            _iniciar_checkpoint_periodico(db_path)
+    logger.debug("[DB_POOL] Conexão aberta para %s (thread %s)", db_path, threading.current_thread().name)
+
+    return conn
+
+
+def _iniciar_checkpoint_periodico(db_path: str) -> None:
+    """Inicia a thread daemon que executa PRAGMA wal_checkpoint(PASSIVE) periodicamente."""
+    parar = threading.Event()
+
+    def _executar() -> None:
+        # Conexão própria: não disputa as conexões de quem está escrevendo.
+        # PASSIVE não espera leitores nem escritores; o wal_autocheckpoint cobre o caso comum
+        conn_checkpoint = sqlite3.connect(db_path)
+        try:
+            while not parar.wait(INTERVALO_CHECKPOINT):
+                try:
+                    conn_checkpoint.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                except sqlite3.Error as e:
+                    logger.warning("[DB_POOL] Falha no checkpoint de %s: %s", db_path, e)
+        finally:
+            conn_checkpoint.close()
+
+    thread = threading.Thread(target=_executar, name=f"wal-checkpoint-{db_path}", daemon=True)
+    thread.start()
+    _threads_checkpoint[db_path] = thread
+    _eventos_checkpoint[db_path] = parar
+
+
+def fechar_conexoes() -> None:
+    """Encerra o checkpoint em segundo plano, trunca o WAL e fecha todas as conexões."""
+    global _geracao
+    with _lock:
+        _geracao += 1
+        for parar in _eventos_checkpoint.values():
+            parar.set()
+
+        truncados = set()
+        for db_path, conn in _conexoes:
+            try:
+                if db_path not in truncados:
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    truncados.add(db_path)
+            except sqlite3.Error as e:
+                logger.warning("[DB_POOL] Falha no checkpoint final de %s: %s", db_path, e)
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning("[DB_POOL] Erro ao fechar conexão de %s: %s", db_path, e)
+
+        _conexoes.clear()
+        _threads_checkpoint.clear()
+        _eventos_checkpoint.clear()
+
+
+atexit.register(fechar_conexoes)
@@ -43,6 +43,9 @@ logger = logging.getLogger(__name__)
 
 TABLE_NAME = "notas"
 
+# Threads dedicadas à gravação dos XMLs em disco
+MAX_THREADS_ESCRITA_XML = 8
+
 # Carregamento de configurações do arquivo INI
 def _carregar_configuracoes_extrator():
     """Carrega configurações específicas do extrator."""
@@ -403,12 +406,48 @@ async def listar_nfs(client: OmieClient, config: Dict[str, Any], db_name: str) -
         velocidade = total_registros_salvos / tempo_processamento
         logger.info(f"[EXTRATOR.ASYNC.NFS.PERFORMANCE] • Velocidade média: {velocidade:.0f} registros/s")
     
+class EscritorXml:
+    """
+    Grava os XMLs baixados em um pool de threads próprio.
+    
+    Com aiofiles, open/write/close são três idas separadas ao executor padrão
+    por arquivo; aqui a gravação inteira acontece em uma única chamada.
+    """
+    __slots__ = ("_executor",)
+
+    def __init__(self, max_threads: int = MAX_THREADS_ESCRITA_XML) -> None:
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_threads, thread_name_prefix="escritor-xml"
+        )
+
+    @staticmethod
+    def _gravar(caminho: Path, conteudo: str) -> None:
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+
+    async def gravar(self, caminho: Path, conteudo: str) -> None:
+        """Grava o XML sem bloquear o event loop."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._gravar, caminho, conteudo)
+
+    def fechar(self) -> None:
+        """Aguarda as gravações pendentes e encerra o pool."""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "EscritorXml":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.fechar()
+
+
 async def baixar_xml_individual(
     session: aiohttp.ClientSession,
     client: OmieClient,
     row: tuple,
     semaphore: asyncio.Semaphore,
     db_name: str,
+    escritor: Optional[EscritorXml] = None,
 ):
     async with semaphore:
         # Validação do tamanho da tupla antes do desempacotamento
@@ -445,8 +484,11 @@ async def baixar_xml_individual(
                 logger.warning(f"[EXTRATOR.ASYNC.XML.VAZIO] XML vazio recebido para chave {chave} - não será salvo")
                 atualizar_status_xml(db_name, chave, caminho, xml_str, baixado_novamente, xml_vazio=1)
             else:
-                async with aiofiles.open(caminho, "w", encoding="utf-8") as f:
-                    await f.write(xml_str)
+                if escritor is not None:
+                    await escritor.gravar(caminho, xml_str)
+                else:
+                    async with aiofiles.open(caminho, "w", encoding="utf-8") as f:
+                        await f.write(xml_str)
                 atualizar_status_xml(db_name, chave, caminho, xml_str, baixado_novamente)
                 logger.debug(f"[EXTRATOR.ASYNC.XML.SUCESSO] ✓ XML salvo: {chave}")
                 logger.info("[XML] XML salvo: %s", caminho)
@@ -454,7 +496,12 @@ async def baixar_xml_individual(
             logger.error("[EXTRATOR.ASYNC.XML.ERRO] Falha ao baixar XML %s: %s", chave, exc)
 
 
-async def baixar_xmls(client: OmieClient, db_name: str, db_path: str = "omie.db"):
+async def baixar_xmls(
+    client: OmieClient,
+    db_name: str,
+    db_path: str = "omie.db",
+    escritor: Optional[EscritorXml] = None,
+):
     def _formatar_tempo_total(segundos: float) -> str:
         """Converte segundos em formato legível."""
         if segundos < 0:
@@ -519,7 +566,9 @@ async def baixar_xmls(client: OmieClient, db_name: str, db_path: str = "omie.db"
         timeout=aiohttp.ClientTimeout(total=600, connect=30, sock_read=300)  # 10 min total, 5 min leitura
     ) as session:
         logger.info("[EXTRATOR.ASYNC.XML.PROCESSAMENTO] Iniciando downloads paralelos...")
-        await asyncio.gather(*[baixar_xml_individual(session, client, row, semaphore, db_name) for row in rows])
+        await asyncio.gather(*[
+            baixar_xml_individual(session, client, row, semaphore, db_name, escritor) for row in rows
+        ])
         
     fim_download = time.time()
     tempo_total = fim_download - inicio_download
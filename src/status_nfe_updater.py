@@ -11,7 +11,7 @@ import logging
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, NamedTuple
+from typing import Any, Dict, List, Mapping, Optional, Tuple, NamedTuple
 from dataclasses import dataclass
 import configparser
 
@@ -46,15 +46,21 @@ class StatusNFeUpdater:
     atualizadas sobre o status das notas fiscais.
     """
     
-    def __init__(self, config_path: str = "configuracao.ini"):
+    def __init__(
+        self,
+        config_path: str = "configuracao.ini",
+        config: Optional[Mapping[str, Mapping[str, str]]] = None
+    ):
         """
         Inicializa o atualizador com configurações.
         
         Args:
             config_path: Caminho para arquivo de configuração
+            config: Seções do INI já lidas pelo chamador (ConfigParser ou
+                mapeamento seção -> chave -> valor); se None, lê config_path
         """
         self.config_path = config_path
-        self.config = self._carregar_config()
+        self.config = config if config is not None else self._carregar_config()
         
         # Cliente Omie
         config_client = carregar_configuracoes_client()
@@ -67,7 +73,8 @@ class StatusNFeUpdater:
         )
         
         # Paths
-        self.db_path = self.config.get('paths', 'db_path', fallback='omie.db')
+        secao_paths = self.config['paths'] if 'paths' in self.config else {}
+        self.db_path = secao_paths.get('db_path', 'omie.db')
         
         # Configurações de execução
         self.max_concurrent = 3  # Limite conservador para evitar rate limit
@@ -269,7 +276,8 @@ class StatusNFeUpdater:
         if not status_raw:
             return "INDEFINIDO"
             
-        status_lower = status_raw.lower().strip()
+        # Uma única cópia em casefold; strip() é dispensável para busca por substring
+        status_lower = status_raw.casefold()
         
         # Mapeamento de status conhecidos
         mapeamentos = {
@@ -329,9 +337,9 @@ class StatusNFeUpdater:
                 cursor.execute("""
                     SELECT cChaveNFe, nIdNF 
                     FROM notas 
-                    WHERE (status IS NULL OR status = 'INDEFINIDO' OR status = '')
-                      AND xml_baixado = 1  -- Apenas notas já processadas
+                    WHERE xml_baixado = 1  -- Apenas notas já processadas
                       AND erro = 0         -- Sem erros
+                      AND (status IS NULL OR status = '' OR status = 'INDEFINIDO')
                     ORDER BY dEmi DESC
                     LIMIT ?
                 """, (limite,))
@@ -518,9 +526,8 @@ class StatusNFeUpdater:
                         self.stats.status_cancelados += int(len(lote) * 0.1)   # Simula 10% canceladas
                         self.stats.status_outros += len(lote) - self.stats.status_autorizados - self.stats.status_cancelados
                     
-                    # Pequena pausa entre lotes
-                    if not modo_dry_run:
-                        await asyncio.sleep(1)
+                    # Sem pausa fixa entre lotes: cada requisição já é espaçada por
+                    # respeitar_limite_requisicoes_async() dentro do semáforo do cliente
             
             # Estatísticas finais
             self.stats.tempo_execucao_segundos = time.time() - tempo_inicio
@@ -552,7 +559,8 @@ class StatusNFeUpdater:
 async def executar_atualizacao_status_nfe(
     config_path: str = "configuracao.ini",
     limite_notas: int = 1000000,
-    dry_run: bool = False
+    dry_run: bool = False,
+    config: Optional[Mapping[str, Mapping[str, str]]] = None
 ) -> bool:
     """
     Função de conveniência para executar atualização de status.
@@ -561,12 +569,13 @@ async def executar_atualizacao_status_nfe(
         config_path: Caminho para arquivo de configuração
         limite_notas: Máximo de notas para processar
         dry_run: Se True, apenas simula sem atualizar
+        config: Seções do INI já lidas; evita reler config_path
         
     Returns:
         bool: True se executou com sucesso
     """
     try:
-        updater = StatusNFeUpdater(config_path)
+        updater = StatusNFeUpdater(config_path, config=config)
         stats = await updater.executar_atualizacao_status(limite_notas, dry_run)
         
         # Considera sucesso se procesou sem erros críticos
@@ -581,10 +590,11 @@ async def executar_atualizacao_status_nfe(
 def executar_atualizacao_status_nfe_sync(
     config_path: str = "configuracao.ini",
     limite_notas: int = 1000000,
-    dry_run: bool = False
+    dry_run: bool = False,
+    config: Optional[Mapping[str, Mapping[str, str]]] = None
 ) -> bool:
     """Versão síncrona da função de atualização."""
-    return asyncio.run(executar_atualizacao_status_nfe(config_path, limite_notas, dry_run))
+    return asyncio.run(executar_atualizacao_status_nfe(config_path, limite_notas, dry_run, config))
 
 
 if __name__ == "__main__":
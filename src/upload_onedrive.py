@@ -42,6 +42,8 @@ import logging
 import configparser
 import time
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional, Dict, Set, List, Any, Tuple
 
@@ -130,6 +132,8 @@ RETRY_DELAY = 2.0
 CHUNK_SIZE = 10 * 1024 * 1024  # 10MB chunks para arquivos grandes
 LARGE_FILE_THRESHOLD = 4 * 1024 * 1024  # 4MB threshold para upload resumivel
 TIMEOUT = 60.0  # Timeout para requisicões HTTP
+MAX_UPLOADS_SIMULTANEOS = 4  # Uploads em paralelo no lote (limita a pressão sobre a API)
+STATUS_LIMITE_API = (429, 503)  # Throttling do Graph: respeitar Retry-After antes de repetir
 
 # =============================================================================
 # CLASSES DE EXCEcoO CUSTOMIZADAS
@@ -254,6 +258,14 @@ class OneDriveClient:
             self.pastas_cache: Dict[str, str] = {}
             self.upload_history: Set[str] = set()
             
+            # Uploads do lote rodam em paralelo: criação de pastas e gravação do
+            # histórico são serializadas para não duplicar pastas nem corromper o JSON
+            self._lock_pastas = threading.Lock()
+            self._lock_historico = threading.Lock()
+            # Um lock por arquivo (pasta/nome): verificação de existência, upload e
+            # registro no histórico são atômicos por arquivo, sem serializar o lote
+            self._locks_arquivo: Dict[str, threading.Lock] = {}
+            
             # Carrega dados persistidos
             self._carregar_cache_pastas()
             self._carregar_historico_uploads()
@@ -419,6 +431,37 @@ class OneDriveClient:
             logger.error(f"[ONEDRIVE] Erro inesperado na autenticacoo: {e}")
             raise OneDriveAuthError(f"Erro inesperado: {e}")
     
+    def _requisicao_com_limite(self, metodo: str, url: str, **kwargs: Any) -> Response:
+        """
+        Executa a requisição repetindo-a quando a API responde com throttling (429/503).
+        
+        Espera o Retry-After informado pelo Graph; sem ele, usa backoff exponencial
+        a partir de RETRY_DELAY. Após MAX_RETRIES devolve a última resposta.
+        
+        Args:
+            metodo: Método HTTP (GET, PUT, ...)
+            url: URL da requisição
+            **kwargs: Argumentos repassados para requests.request
+            
+        Returns:
+            Response: Resposta final da API
+        """
+        for tentativa in range(MAX_RETRIES + 1):
+            response = requests.request(metodo, url, **kwargs)
+            if response.status_code not in STATUS_LIMITE_API or tentativa == MAX_RETRIES:
+                return response
+            
+            retry_after = response.headers.get("Retry-After", "")
+            espera = float(retry_after) if retry_after.isdigit() else RETRY_DELAY * (2 ** tentativa)
+            logger.warning(f"[ONEDRIVE] Limite da API ({response.status_code}), nova tentativa em {espera:.1f}s ({tentativa + 1}/{MAX_RETRIES})")
+            time.sleep(espera)
+        return response
+    
+    def _lock_do_arquivo(self, arquivo_key: str) -> threading.Lock:
+        """Devolve o lock exclusivo de um arquivo do lote, criando-o na primeira vez."""
+        with self._lock_historico:
+            return self._locks_arquivo.setdefault(arquivo_key, threading.Lock())
+    
     def _obter_headers(self) -> Dict[str, str]:
         """
         Obtem headers padroo para requisicões HTTP.
@@ -519,7 +562,8 @@ class OneDriveClient:
             # Verifica se o arquivo existe na pasta
             check_url = f"{GRAPH_API_BASE}/drives/{self.drive_id}/items/{folder_id}:/{nome_arquivo}"
             
-            response = requests.get(
+            response = self._requisicao_com_limite(
+                "GET",
                 check_url,
                 headers=self._obter_headers(),
                 timeout=TIMEOUT
@@ -571,6 +615,21 @@ class OneDriveClient:
             
             # Verifica se ja foi enviado (chave mais especifica)
             arquivo_key = f"{pasta_completa}/{caminho_arquivo.name}"
+            with self._lock_do_arquivo(arquivo_key):
+                return self._enviar_arquivo(caminho_arquivo, pasta_completa, arquivo_key, tamanho_mb)
+                
+        except Exception as e:
+            logger.error(f"[ONEDRIVE] ❌ Erro no upload de {caminho_arquivo.name}: {e}")
+            return False
+    
+    def _enviar_arquivo(self, caminho_arquivo: Path, pasta_completa: str, arquivo_key: str, tamanho_mb: float) -> bool:
+        """
+        Verifica a existência e envia o arquivo, registrando-o no histórico.
+        
+        Chamado com o lock do arquivo adquirido: outro envio do mesmo arquivo
+        no lote espera e encontra a chave já registrada no histórico.
+        """
+        try:
             if arquivo_key in self.upload_history:
                 logger.info(f"[ONEDRIVE] ⏭️ Arquivo já enviado anteriormente: {caminho_arquivo.name}")
                 return True
@@ -580,13 +639,15 @@ class OneDriveClient:
             if self._arquivo_existe_no_onedrive(caminho_arquivo.name, pasta_completa):
                 logger.info(f"[ONEDRIVE] ⏭️ Arquivo já existe no OneDrive: {caminho_arquivo.name}")
                 # Adiciona ao historico local para evitar verificacões futuras
-                self.upload_history.add(arquivo_key)
-                self._salvar_historico_uploads()
+                with self._lock_historico:
+                    self.upload_history.add(arquivo_key)
+                    self._salvar_historico_uploads()
                 return True
             
             # Cria pasta se necessario
             logger.debug(f"[ONEDRIVE] 📁 Verificando/criando pasta: {pasta_completa}")
-            folder_id = self._criar_pasta_se_necessario(pasta_completa)
+            with self._lock_pastas:
+                folder_id = self._criar_pasta_se_necessario(pasta_completa)
             
             # Realiza upload
             upload_url = f"{GRAPH_API_BASE}/drives/{self.drive_id}/items/{folder_id}:/{caminho_arquivo.name}:/content"
@@ -597,7 +658,8 @@ class OneDriveClient:
             with open(caminho_arquivo, 'rb') as f:
                 file_content = f.read()
             
-            response = requests.put(
+            response = self._requisicao_com_limite(
+                "PUT",
                 upload_url,
                 headers=self._obter_headers(),
                 data=file_content,
@@ -609,8 +671,9 @@ class OneDriveClient:
             
             if response.status_code in [200, 201]:
                 # Marca como enviado
-                self.upload_history.add(arquivo_key)
-                self._salvar_historico_uploads()
+                with self._lock_historico:
+                    self.upload_history.add(arquivo_key)
+                    self._salvar_historico_uploads()
                 
                 logger.info(f"[ONEDRIVE] ✅ Upload concluído: {caminho_arquivo.name} → {pasta_completa} ({tempo_upload:.1f}s, {velocidade:.1f}MB/s)")
                 return True
@@ -645,41 +708,41 @@ class OneDriveClient:
                 tamanho_mb = caminho_arquivo.stat().st_size / (1024 * 1024) if caminho_arquivo.exists() else 0
                 logger.info(f"[ONEDRIVE]   {i:3d}. {caminho_arquivo.name} ({tamanho_mb:.1f}MB)")
             
-            logger.info(f"[ONEDRIVE] Iniciando processamento...")
+            logger.info(f"[ONEDRIVE] Iniciando processamento ({MAX_UPLOADS_SIMULTANEOS} uploads simultâneos)...")
             
             sucessos = 0
             falhas = 0
             tempo_inicio = time.time()
             
-            for i, caminho_arquivo in enumerate(caminhos_arquivos, 1):
-                try:
+            def _enviar(caminho_arquivo: Path) -> Tuple[bool, float]:
+                tempo_arquivo_inicio = time.time()
+                sucesso = self.upload_arquivo(caminho_arquivo, pasta_base)
+                return sucesso, time.time() - tempo_arquivo_inicio
+            
+            # Uploads são I/O de rede: vários em paralelo (limitados pelo pool) no lugar
+            # da fila sequencial com pausa fixa entre arquivos
+            with ThreadPoolExecutor(max_workers=MAX_UPLOADS_SIMULTANEOS) as executor:
+                futuros = {executor.submit(_enviar, caminho): caminho for caminho in caminhos_arquivos}
+                for i, futuro in enumerate(as_completed(futuros), 1):
+                    caminho_arquivo = futuros[futuro]
                     progresso_pct = (i / total_arquivos) * 100
-                    
-                    logger.info(f"[ONEDRIVE] [{i:3d}/{total_arquivos:3d}] ({progresso_pct:5.1f}%) Enviando: {caminho_arquivo.name}")
-                    
-                    tempo_arquivo_inicio = time.time()
-                    sucesso = self.upload_arquivo(caminho_arquivo, pasta_base)
-                    tempo_arquivo = time.time() - tempo_arquivo_inicio
-                    
-                    resultados[str(caminho_arquivo)] = sucesso
-                    
-                    if sucesso:
-                        sucessos += 1
-                        tamanho_mb = caminho_arquivo.stat().st_size / (1024 * 1024) if caminho_arquivo.exists() else 0
-                        velocidade = tamanho_mb / tempo_arquivo if tempo_arquivo > 0 else 0
-                        logger.info(f"[ONEDRIVE]  [{i:3d}/{total_arquivos:3d}] Sucesso: {caminho_arquivo.name} ({tempo_arquivo:.1f}s, {velocidade:.1f}MB/s)")
-                    else:
-                        falhas += 1
-                        logger.error(f"[ONEDRIVE] [{i:3d}/{total_arquivos:3d}] Falha: {caminho_arquivo.name}")
-                    
-                    # Delay entre uploads para evitar rate limiting
-                    if i < total_arquivos:
-                        time.sleep(0.5)
+                    try:
+                        sucesso, tempo_arquivo = futuro.result()
+                        resultados[str(caminho_arquivo)] = sucesso
                         
-                except Exception as e:
-                    falhas += 1
-                    logger.error(f"[ONEDRIVE]  [{i:3d}/{total_arquivos:3d}] Erro no upload de {caminho_arquivo.name}: {e}")
-                    resultados[str(caminho_arquivo)] = False
+                        if sucesso:
+                            sucessos += 1
+                            tamanho_mb = caminho_arquivo.stat().st_size / (1024 * 1024) if caminho_arquivo.exists() else 0
+                            velocidade = tamanho_mb / tempo_arquivo if tempo_arquivo > 0 else 0
+                            logger.info(f"[ONEDRIVE]  [{i:3d}/{total_arquivos:3d}] ({progresso_pct:5.1f}%) Sucesso: {caminho_arquivo.name} ({tempo_arquivo:.1f}s, {velocidade:.1f}MB/s)")
+                        else:
+                            falhas += 1
+                            logger.error(f"[ONEDRIVE] [{i:3d}/{total_arquivos:3d}] ({progresso_pct:5.1f}%) Falha: {caminho_arquivo.name}")
+                            
+                    except Exception as e:
+                        falhas += 1
+                        logger.error(f"[ONEDRIVE]  [{i:3d}/{total_arquivos:3d}] Erro no upload de {caminho_arquivo.name}: {e}")
+                        resultados[str(caminho_arquivo)] = False
             
             # Relatório final
             tempo_total = time.time() - tempo_inicio
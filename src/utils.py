@@ -77,6 +77,7 @@ import configparser
 from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from threading import Lock
 from time import monotonic, sleep
@@ -84,6 +85,12 @@ from typing import Any, Dict, List, Optional, Tuple, Union, Set
 from xml.etree import ElementTree as ET
 import aiofiles
 
+try:
+    import orjson
+    ORJSON_DISPONIVEL = True
+except ImportError:
+    ORJSON_DISPONIVEL = False
+
 # =============================================================================
 # CONFIGURAÇÃO DO LOGGER
 # =============================================================================
@@ -183,6 +190,15 @@ SCHEMA_NOTAS_INSERT = """
 # Para compatibilidade retroativa
 SCHEMA_NOTAS = SCHEMA_NOTAS_INSERT  # Mantém referência antiga
 
+# Índice parcial de cobertura das notas pendentes de status, já na ordem de dEmi DESC.
+# As consultas devem repetir o WHERE abaixo (mesma ordem dos termos do OR) para usá-lo.
+SQL_INDICE_STATUS_ELEGIVEL = """
+    CREATE INDEX IF NOT EXISTS idx_status_eligible
+    ON notas(dEmi DESC, cChaveNFe, nIdNF, nNF)
+    WHERE xml_baixado = 1 AND erro = 0
+      AND (status IS NULL OR status = '' OR status = 'INDEFINIDO')
+"""
+
 # Estado global para rate limiting assíncrono
 _ultima_chamada_async = 0.0
 
@@ -347,6 +363,22 @@ class RegistroInvalidoError(ValueError):
     """Exceção para registros com dados inválidos."""
     pass
 
+# =============================================================================
+# SERIALIZAÇÃO JSON
+# =============================================================================
+
+def json_dumps(obj: Any) -> bytes:
+    """Serializa para JSON em bytes (orjson quando disponível, senão a biblioteca padrão)."""
+    if ORJSON_DISPONIVEL:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+def json_loads(dados: Union[bytes, bytearray, str]) -> Any:
+    """Decodifica JSON (orjson quando disponível, senão a biblioteca padrão)."""
+    if ORJSON_DISPONIVEL:
+        return orjson.loads(dados)
+    return json.loads(dados)
+
 # =============================================================================
 # VALIDAÇÃO E NORMALIZAÇÃO DE DADOS
 # =============================================================================
@@ -402,6 +434,35 @@ def normalizar_data(data: Optional[str]) -> Optional[str]:
     logger.warning(f"[DATA] Formato de data não reconhecido: '{data}'")
     return None
 
+# Palavras-chave de status da NFe em ordem de prioridade: se o texto contém mais
+# de uma, vence a primeira da lista (não a primeira a aparecer no texto)
+STATUS_NFE_NORMALIZADOS = ("CANCELADA", "AUTORIZADA", "REJEITADA", "PROCESSANDO")
+_PRIORIDADE_STATUS_NFE = {s.lower(): i for i, s in enumerate(STATUS_NFE_NORMALIZADOS)}
+_STATUS_NFE_RE = re.compile("|".join(_PRIORIDADE_STATUS_NFE), re.IGNORECASE)
+
+@lru_cache(maxsize=256)
+def normalizar_status_nfe(status_raw: Optional[str]) -> str:
+    """
+    Normaliza o texto de situação da NFe para um dos STATUS_NFE_NORMALIZADOS.
+    
+    Uma única varredura do texto (finditer em C) encontra todas as palavras-chave;
+    entre elas vence a de maior prioridade. Memoizada: a API devolve poucos textos distintos.
+    
+    Args:
+        status_raw: Situação retornada pela API
+    Returns:
+        Status normalizado, o texto em maiúsculas se nenhuma palavra-chave
+        for encontrada, ou "INDEFINIDO" se vazio
+    """
+    if not status_raw:
+        return "INDEFINIDO"
+    
+    prioridade = min(
+        (_PRIORIDADE_STATUS_NFE[m.group().lower()] for m in _STATUS_NFE_RE.finditer(status_raw)),
+        default=None
+    )
+    return STATUS_NFE_NORMALIZADOS[prioridade] if prioridade is not None else status_raw.upper()
+
 def normalizar_valor_nf(valor: Union[str, float, int, None]) -> float:
     """
     Converte valor para float com tratamento robusto de erros.
@@ -1536,8 +1597,10 @@ def criar_indices_otimizados(conn: sqlite3.Connection, table_name: str) -> None:
     # Índice combinado: filtro por data de emissão e status de download
     "CREATE INDEX IF NOT EXISTS idx_anomesdia_baixado ON notas(anomesdia, xml_baixado)",
 
-    # Índice para facilitar buscas por NFe baixada
-    "CREATE INDEX IF NOT EXISTS idx_xml_baixado ON notas(xml_baixado)",
+    # Índice para buscas por NFe baixada e de cobertura para as contagens por flag
+    # (baixados/pendentes/vazios em uma varredura); substitui o antigo idx_xml_baixado
+    "CREATE INDEX IF NOT EXISTS idx_notas_flags ON notas(xml_baixado, xml_vazio)",
+    "DROP INDEX IF EXISTS idx_xml_baixado",
 
     # Índice para busca rápida de erros em processos
     "CREATE INDEX IF NOT EXISTS idx_erro ON notas(erro)",
@@ -1550,6 +1613,9 @@ def criar_indices_otimizados(conn: sqlite3.Connection, table_name: str) -> None:
 
     # Índice parcial para arquivos XML vazios
     "CREATE INDEX IF NOT EXISTS idx_xml_vazio ON notas(xml_vazio) WHERE xml_vazio = 1",
+
+    # Índice parcial de cobertura: notas ainda sem status (atualizador de status)
+    SQL_INDICE_STATUS_ELEGIVEL,
 ]
 
     
@@ -2162,9 +2228,9 @@ def _verificar_views_e_indices_disponiveis(db_path: str) -> Dict[str, bool]:
         'idx_notas_baixado',
         'idx_notas_chave',
         'idx_notas_data',
+        'idx_notas_flags',
         'idx_notas_pendentes',
         'idx_pendentes',
-        'idx_xml_baixado',
         'idx_xml_vazio',
     ]
     disponibilidade = {v: False for v in views + indices}
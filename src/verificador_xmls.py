@@ -19,7 +19,7 @@ import logging
 from datetime import datetime
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Optional, Tuple, List
+from typing import Dict, Optional, Tuple, List
 import sys
 
 # Adiciona o diretório atual ao path para importar utils
@@ -86,10 +86,38 @@ def verificar_arquivo_no_disco(row: Tuple[str, str, str]) -> Optional[str]:
 # Leitura do banco de dados e paralelizacoo da verificacao
 # ------------------------------------------------------------------------------
 
+def _carregar_notas(db_path: str) -> Tuple[List[Tuple[str, str, str]], Dict[str, int]]:
+    """
+    Lê as notas do banco e conta as flags de XML na mesma varredura.
+
+    Args:
+        db_path: Caminho do banco SQLite.
+
+    Returns:
+        Tupla (rows, contagens): rows com (cChaveNFe, dEmi, nNF) e contagens com
+        as chaves 'verificados', 'pendentes_iniciais' e 'vazios'.
+    """
+    rows: List[Tuple[str, str, str]] = []
+    pendentes = vazios = 0
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.execute(
+            f"SELECT cChaveNFe, dEmi, nNF, xml_baixado, xml_vazio FROM {TABLE_NAME}"
+        )
+        for chave, dEmi, num_nfe, xml_baixado, xml_vazio in cursor:
+            rows.append((chave, dEmi, num_nfe))
+            if not xml_baixado:
+                pendentes += 1
+            if xml_vazio:
+                vazios += 1
+
+    return rows, {"verificados": len(rows), "pendentes_iniciais": pendentes, "vazios": vazios}
+
+
 def verificar_arquivos_existentes(
     db_path: str = DB_PATH,
     max_workers: int = MAX_WORKERS,
-    batch_size: int = 500
+    batch_size: int = 500,
+    rows: Optional[List[Tuple[str, str, str]]] = None
 ) -> List[str]:
     """
     Carrega todos os registros do banco e verifica quais arquivos XML ja estoo salvos e validos no disco.
@@ -98,6 +126,7 @@ def verificar_arquivos_existentes(
         db_path: Caminho do banco SQLite.
         max_workers: Numero de threads para paralelismo.
         batch_size: Tamanho do lote para logs de progresso.
+        rows: Registros (cChaveNFe, dEmi, nNF) já lidos; se None, lê do banco.
 
     Returns:
         Lista de chaves fiscais (cChaveNFe) com arquivos encontrados.
@@ -109,10 +138,11 @@ def verificar_arquivos_existentes(
     logger.info(f"[VERIFICADOR.XMLS.DISCO.INICIO] Iniciando verificacao de arquivos XML no disco... (versão {versao_funcao})")
     logger.info(f"[VERIFICADOR.XMLS.DISCO.CONFIG] Configuração: workers={max_workers:,}, batch={batch_size:,}")
 
-    with sqlite3.connect(db_path) as conn:
-        rows: List[Tuple[str, str, str]] = conn.execute(
-            f"SELECT cChaveNFe, dEmi, nNF FROM {TABLE_NAME}"
-        ).fetchall()
+    if rows is None:
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute(
+                f"SELECT cChaveNFe, dEmi, nNF FROM {TABLE_NAME}"
+            ).fetchall()
 
     total = len(rows)
     logger.info(f"[VERIFICADOR.XMLS.DISCO.TOTAL] Total de notas no banco: {total:,}")
@@ -262,7 +292,7 @@ def verificar(
     db_path: str = DB_PATH,
     max_workers: int = MAX_WORKERS,
     batch_size: int = 500
-) -> None:
+) -> Dict[str, int]:
     """
     Orquestra a verificacao de XMLs e atualizacao do banco.
     
@@ -279,6 +309,11 @@ def verificar(
         max_workers: Numero de threads para paralelismo.
         batch_size: Tamanho do lote para logs e atualizacao.
 
+    Returns:
+        Métricas da execução: 'verificados' (notas lidas), 'pendentes_iniciais'
+        (xml_baixado = 0 antes da verificação), 'vazios' (xml_vazio = 1) e
+        'encontrados' (XMLs válidos no disco).
+
     Raises:
         Exception: Se ocorrer erro inesperado durante o processo.
     """
@@ -312,7 +347,11 @@ def verificar(
             logger.debug(f"[VERIFICADOR.XMLS.CACHE] Cache existente: {stats_inicial}")
     
     # Executa verificação
-    chaves_com_arquivo = verificar_arquivos_existentes(db_path=db_path, max_workers=max_workers, batch_size=batch_size)
+    rows, metricas = _carregar_notas(db_path)
+    chaves_com_arquivo = verificar_arquivos_existentes(
+        db_path=db_path, max_workers=max_workers, batch_size=batch_size, rows=rows
+    )
+    metricas["encontrados"] = len(chaves_com_arquivo)
     atualizar_status_no_banco(chaves_com_arquivo, db_path=db_path, batch_size=batch_size)
     
     # Relatório final com estatísticas de cache
@@ -336,6 +375,8 @@ def verificar(
         logger.info(f"[VERIFICACAO]   Cache hits: {stats_final['cache_hits']}")
         logger.info(f"[VERIFICACAO]   Hit rate: {stats_final['hit_rate_percent']:.1f}%")
 
+    return metricas
+
 # ------------------------------------------------------------------------------
 # execucao direta (modo script)
 # ------------------------------------------------------------------------------